@@ -7,20 +7,319 @@ This script loads the raw CSV and shows:
 - Data types and missing values
 - Sample tracks
 - Distribution of key features
+
+Profiling mode (python scripts/explore_data.py --profile):
+Computes the same statistics in a single chunked pass over the CSV
+(null counts, min/max/mean/std, range histograms, duplicates, top genres/artists)
+and writes a JSON + HTML report instead of printing everything.
+Row-level listings are capped, so this stays fast on 10M+ row files.
 """
 
+import argparse
+import html
+import json
+
 import pandas as pd
 import numpy as np
 from pathlib import Path
 
 # ========================
-# LOAD THE DATA
+# SETTINGS
 # ========================
 # Define path to the raw CSV file
 RAW_DATA = Path("data/raw/spotify_tracks.csv")
+# Where the profiling report goes (.json + .html)
+PROFILE_OUT = Path("data/processed/profile")
+# Never print/store more than this many individual rows (e.g. rows with missing values)
+MAX_LISTED_ROWS = 20
+
+# Popularity ranges shown in the report, and features that live on a 0-1 scale
+POP_RANGES = [(0, 20), (20, 40), (40, 60), (60, 80), (80, 100)]
+UNIT_FEATURES = ["danceability", "energy", "valence", "acousticness",
+                 "instrumentalness", "liveness", "speechiness"]
+
+
+def parse_args():
+    """Command line options (all optional; default is the classic printout)."""
+    parser = argparse.ArgumentParser(description="Explore / profile the raw Spotify CSV.")
+    parser.add_argument("--profile", action="store_true",
+                        help="single-pass profiling report (JSON + HTML) instead of the printout")
+    parser.add_argument("--csv", type=Path, default=RAW_DATA, help="input CSV")
+    parser.add_argument("--out", type=Path, default=PROFILE_OUT, help="report path without extension")
+    parser.add_argument("--chunksize", type=int, default=500_000, help="rows per chunk when profiling")
+    parser.add_argument("--max-rows", type=int, default=MAX_LISTED_ROWS, help="cap for row-level listings")
+    parser.add_argument("--top-k", type=int, default=15, help="how many top genres/artists to keep")
+    return parser.parse_args()
+
+
+def explicit_flags(raw):
+    """
+    Parse an explicit column the way prep_data.py's validate_rows does.
+
+    Numeric columns (0/1, read as float64 when a cell is blank) count 1 as
+    explicit; text columns accept "true"/"1". Missing or unknown values are
+    not explicit.
+
+    Args:
+        raw: The explicit column as read from the CSV
+
+    Returns:
+        pd.Series: Boolean flags
+    """
+    if raw.dtype == bool:
+        return raw
+    if pd.api.types.is_numeric_dtype(raw):
+        return pd.to_numeric(raw, errors="coerce").eq(1)
+    return raw.astype(str).str.strip().str.lower().isin(["true", "1"])
+
+
+def profile_csv(path, chunksize=500_000, max_rows=MAX_LISTED_ROWS, top_k=15):
+    """
+    Profile a CSV in one streaming pass (one read per chunk, nothing re-scanned).
+
+    Per chunk we collect counts, sums, min/max and variance per numeric column,
+    then merge them with Chan's parallel formula so mean/std are exact across
+    chunks. Duplicates are found through 64-bit row hashes, and genres/artists
+    through merged value counts.
+
+    Args:
+        path: CSV file to profile
+        chunksize: Rows per chunk (memory stays bounded by this)
+        max_rows: Maximum number of rows listed individually (rows with missing values)
+        top_k: Number of genres / artists / tracks to keep in the top lists
+
+    Returns:
+        dict: JSON-serializable report
+    """
+    n_rows = 0
+    dtypes = None
+    nulls = None
+    rows_with_missing = 0
+    missing_examples = []
+    num = {}                       # column -> {n, mean, m2, min, max}
+    pop_ranges = np.zeros(len(POP_RANGES), dtype=np.int64)
+    unit_hist = {}                 # feature -> counts over 10 bins of [0, 1]
+    out_of_unit = {}               # feature -> values outside [0, 1]
+    row_hashes = []
+    track_hashes = []
+    genre_counts = pd.Series(dtype="int64")
+    artist_counts = pd.Series(dtype="int64")
+    all_artists = set()
+    explicit_count = 0
+    top_tracks = None
+    bottom_tracks = None
+    track_cols = ["track_name", "artists", "popularity", "track_genre"]
+
+    for chunk in pd.read_csv(path, chunksize=chunksize):
+        if dtypes is None:
+            dtypes = {c: str(t) for c, t in chunk.dtypes.items()}
+            nulls = pd.Series(0, index=chunk.columns, dtype="int64")
+            # Column kinds for hashing are fixed by the first chunk: a later chunk
+            # can infer float64 instead of int64 (a NaN) or object instead of bool
+            numeric_cols = [c for c, t in chunk.dtypes.items()
+                            if pd.api.types.is_numeric_dtype(t) or pd.api.types.is_bool_dtype(t)]
+
+        # Nulls: one isna() per chunk, reused for column counts and row listing
+        isna = chunk.isna()
+        nulls = nulls.add(isna.sum(), fill_value=0)
+        row_missing = isna.to_numpy().any(axis=1)
+        rows_with_missing += int(row_missing.sum())
+        if len(missing_examples) < max_rows and row_missing.any():
+            take = chunk[row_missing].head(max_rows - len(missing_examples))
+            take_na = isna[row_missing].head(len(take))
+            for (i, row), (_, na) in zip(take.iterrows(), take_na.iterrows()):
+                missing_examples.append({
+                    "index": int(i),
+                    "missing": [c for c in chunk.columns if na[c]],
+                    "track_name": None if pd.isnull(row.get("track_name")) else str(row.get("track_name")),
+                })
+
+        # Numeric stats, merged across chunks (Chan et al.)
+        numeric = chunk.select_dtypes(include="number")
+        counts = numeric.count()
+        means = numeric.mean()
+        m2s = numeric.var(ddof=0) * counts
+        mins = numeric.min()
+        maxs = numeric.max()
+        for c in numeric.columns:
+            nb = int(counts[c])
+            if nb == 0:
+                continue
+            s = num.setdefault(c, {"n": 0, "mean": 0.0, "m2": 0.0, "min": np.inf, "max": -np.inf})
+            na_, nab = s["n"], s["n"] + nb
+            delta = float(means[c]) - s["mean"]
+            s["mean"] += delta * nb / nab
+            s["m2"] += float(m2s[c]) + delta * delta * na_ * nb / nab
+            s["n"] = nab
+            s["min"] = min(s["min"], float(mins[c]))
+            s["max"] = max(s["max"], float(maxs[c]))
+
+        # Range histograms (bincount, no per-range boolean filters)
+        if "popularity" in chunk.columns:
+            pop = chunk["popularity"].to_numpy(dtype=float)
+            pop = pop[(pop >= POP_RANGES[0][0]) & (pop < POP_RANGES[-1][1])]
+            pop_ranges += np.bincount((pop // 20).astype(int), minlength=len(POP_RANGES))[:len(POP_RANGES)]
+        for f in UNIT_FEATURES:
+            if f not in chunk.columns:
+                continue
+            v = chunk[f].to_numpy(dtype=float)
+            v = v[~np.isnan(v)]
+            inside = (v >= 0) & (v <= 1)
+            out_of_unit[f] = out_of_unit.get(f, 0) + int((~inside).sum())
+            bins = np.minimum((v[inside] * 10).astype(int), 9)
+            unit_hist[f] = unit_hist.get(f, np.zeros(10, dtype=np.int64)) + np.bincount(bins, minlength=10)
+
+        # Duplicates via row hashes (exact rows, and same track_name + artists)
+        # (numeric columns as float64, everything else as object, so equal values
+        # hash the same no matter which dtype pandas inferred for the chunk)
+        hashable = chunk.copy()
+        for c in chunk.columns:
+            if c in numeric_cols:
+                hashable[c] = pd.to_numeric(chunk[c], errors="coerce").astype("float64")
+            elif chunk[c].dtype != object:
+                hashable[c] = chunk[c].astype(object)
+        row_hashes.append(pd.util.hash_pandas_object(hashable, index=False).to_numpy())
+        if {"track_name", "artists"} <= set(chunk.columns):
+            track_hashes.append(pd.util.hash_pandas_object(hashable[["track_name", "artists"]], index=False).to_numpy())
+
+        # Genres / artists
+        if "track_genre" in chunk.columns:
+            genre_counts = genre_counts.add(chunk["track_genre"].value_counts(), fill_value=0)
+        if "artists" in chunk.columns:
+            # Split only the distinct artist strings, not every row
+            combos = chunk["artists"].astype(str).value_counts()
+            names = combos.index.str.split(";")
+            main = pd.Series(names.str[0].str.strip(), index=combos.index)
+            artist_counts = artist_counts.add(combos.groupby(main.to_numpy()).sum(), fill_value=0)
+            all_artists.update(a.strip() for sub in names for a in sub)
+        if "explicit" in chunk.columns:
+            explicit_count += int(explicit_flags(chunk["explicit"]).sum())
+
+        # Most / least popular tracks: keep only the running top-k
+        if set(track_cols) <= set(chunk.columns):
+            top_tracks = pd.concat([top_tracks, chunk.nlargest(top_k, "popularity")[track_cols]]).nlargest(top_k, "popularity")
+            bottom_tracks = pd.concat([bottom_tracks, chunk.nsmallest(top_k, "popularity")[track_cols]]).nsmallest(top_k, "popularity")
+
+        n_rows += len(chunk)
+
+    def n_duplicates(hashes):
+        if not hashes:
+            return None
+        h = np.concatenate(hashes)
+        return int(len(h) - len(np.unique(h)))
+
+    numeric_stats = {
+        c: {
+            "count": s["n"],
+            "nulls": int(nulls.get(c, 0)),
+            "min": s["min"],
+            "max": s["max"],
+            "mean": s["mean"],
+            "std": float(np.sqrt(s["m2"] / (s["n"] - 1))) if s["n"] > 1 else None,
+        }
+        for c, s in num.items()
+    }
+
+    return {
+        "source": str(path),
+        "rows": n_rows,
+        "columns": dtypes or {},
+        "nulls": {c: int(v) for c, v in (nulls if nulls is not None else {}).items()},
+        "rows_with_missing": rows_with_missing,
+        "rows_complete": n_rows - rows_with_missing,
+        "missing_examples": missing_examples,
+        "missing_examples_capped_at": max_rows,
+        "numeric": numeric_stats,
+        "popularity_ranges": [
+            {"range": f"{lo}-{hi}", "count": int(c), "percent": float(c / n_rows * 100) if n_rows else 0.0}
+            for (lo, hi), c in zip(POP_RANGES, pop_ranges)
+        ],
+        "unit_feature_histograms": {f: [int(c) for c in h] for f, h in unit_hist.items()},
+        "unit_feature_out_of_range": out_of_unit,
+        "duplicate_rows": n_duplicates(row_hashes),
+        "duplicate_track_artist": n_duplicates(track_hashes),
+        "explicit_tracks": explicit_count,
+        "unique_artists": len(all_artists),
+        "top_genres": {str(k): int(v) for k, v in genre_counts.sort_values(ascending=False).head(top_k).items()},
+        "top_artists": {str(k): int(v) for k, v in artist_counts.sort_values(ascending=False).head(top_k).items()},
+        "most_popular": [] if top_tracks is None else top_tracks.to_dict(orient="records"),
+        "least_popular": [] if bottom_tracks is None else bottom_tracks.to_dict(orient="records"),
+    }
+
+
+def render_html(report):
+    """Turn the profiling report into a small standalone HTML page (tables only)."""
+    def table(headers, rows):
+        head = "".join(f"<th>{html.escape(str(h))}</th>" for h in headers)
+        body = "".join(
+            "<tr>" + "".join(f"<td>{html.escape(str(v))}</td>" for v in row) + "</tr>"
+            for row in rows
+        )
+        return f"<table><tr>{head}</tr>{body}</table>"
+
+    def fmt(v):
+        return f"{v:,.4g}" if isinstance(v, float) else v
+
+    parts = [
+        "<!doctype html><html><head><meta charset='utf-8'><title>Spotify data profile</title>",
+        "<style>body{font-family:sans-serif;margin:2em}table{border-collapse:collapse;margin-bottom:2em}"
+        "td,th{border:1px solid #ccc;padding:4px 8px;text-align:left}</style></head><body>",
+        f"<h1>Data profile: {html.escape(report['source'])}</h1>",
+        f"<p>{report['rows']:,} rows, {len(report['columns'])} columns, "
+        f"{report['rows_with_missing']:,} rows with missing values, "
+        f"{report['duplicate_rows']} duplicate rows, "
+        f"{report['duplicate_track_artist']} duplicate track_name + artists, "
+        f"{report['unique_artists']:,} unique artists.</p>",
+        "<h2>Numeric columns</h2>",
+        table(["column", "count", "nulls", "min", "max", "mean", "std"],
+              [[c] + [fmt(s[k]) for k in ["count", "nulls", "min", "max", "mean", "std"]]
+               for c, s in report["numeric"].items()]),
+        "<h2>Nulls (all columns)</h2>",
+        table(["column", "nulls"], [[c, n] for c, n in report["nulls"].items() if n > 0] or [["-", 0]]),
+        "<h2>Popularity ranges</h2>",
+        table(["range", "count", "percent"], [[r["range"], r["count"], f"{r['percent']:.1f}%"] for r in report["popularity_ranges"]]),
+        "<h2>0-1 features (10 bins, values outside [0, 1] counted separately)</h2>",
+        table(["feature", "histogram", "out of range"],
+              [[f, " ".join(str(c) for c in h), report["unit_feature_out_of_range"].get(f, 0)]
+               for f, h in report["unit_feature_histograms"].items()]),
+        "<h2>Top genres</h2>",
+        table(["genre", "tracks"], report["top_genres"].items()),
+        "<h2>Top artists</h2>",
+        table(["artist", "tracks"], report["top_artists"].items()),
+        "<h2>Most popular tracks</h2>",
+        table(["track", "artists", "popularity", "genre"],
+              [[t["track_name"], t["artists"], t["popularity"], t["track_genre"]] for t in report["most_popular"]]),
+        "<h2>Least popular tracks</h2>",
+        table(["track", "artists", "popularity", "genre"],
+              [[t["track_name"], t["artists"], t["popularity"], t["track_genre"]] for t in report["least_popular"]]),
+        f"<h2>Rows with missing values (first {report['missing_examples_capped_at']})</h2>",
+        table(["index", "track_name", "missing columns"],
+              [[r["index"], r["track_name"], ", ".join(r["missing"])] for r in report["missing_examples"]]),
+        "</body></html>",
+    ]
+    return "\n".join(parts)
+
+
+args = parse_args()
+
+# ========================
+# PROFILING MODE (single pass, writes JSON + HTML, then stops)
+# ========================
+if args.profile:
+    report = profile_csv(args.csv, chunksize=args.chunksize, max_rows=args.max_rows, top_k=args.top_k)
+    args.out.parent.mkdir(parents=True, exist_ok=True)
+    json_path = args.out.with_suffix(".json")
+    html_path = args.out.with_suffix(".html")
+    json_path.write_text(json.dumps(report, indent=2, default=str), encoding="utf-8")
+    html_path.write_text(render_html(report), encoding="utf-8")
+    print(f"Profiled {report['rows']:,} rows -> {json_path}, {html_path}")
+    raise SystemExit(0)
 
+# ========================
+# LOAD THE DATA
+# ========================
 # Load the CSV into a pandas DataFrame
-df = pd.read_csv(RAW_DATA)
+df = pd.read_csv(args.csv)
 
 print("=" * 80)
 print("SPOTIFY DATASET EXPLORATION")
@@ -191,17 +490,13 @@ for idx, (i, row) in enumerate(bottom_tracks.iterrows(), 1):
 # 14. CORRELATION INSIGHTS
 # ========================
 print("\n14. INTERESTING CORRELATIONS:")
-# Check if energy correlates with popularity
-energy_pop_corr = df['energy'].corr(df['popularity'])
-print(f"   Energy vs Popularity: {energy_pop_corr:.3f}")
-
-# Check if danceability correlates with popularity
-dance_pop_corr = df['danceability'].corr(df['popularity'])
-print(f"   Danceability vs Popularity: {dance_pop_corr:.3f}")
-
-# Check if duration affects popularity
-duration_pop_corr = df['duration_min'].corr(df['popularity'])
-print(f"   Duration vs Popularity: {duration_pop_corr:.3f}")
+# Pearson correlation of the three printed features with popularity, read
+# from one small DataFrame.corr matrix instead of one Series.corr per pair
+corr_cols = ['popularity', 'energy', 'danceability', 'duration_min']
+pop_corr = df[corr_cols].corr(method='pearson')['popularity']
+print(f"   Energy vs Popularity: {pop_corr['energy']:.3f}")
+print(f"   Danceability vs Popularity: {pop_corr['danceability']:.3f}")
+print(f"   Duration vs Popularity: {pop_corr['duration_min']:.3f}")
 
 # Check if explicit status affects popularity
 if 'explicit' in df.columns:
@@ -228,9 +523,13 @@ rows_with_missing = df[df.isnull().any(axis=1)]
 if len(rows_with_missing) == 0:
     print("   No rows with missing values!")
 else:
-    print(f"   Found {len(rows_with_missing)} row(s) with missing values:\n")
+    print(f"   Found {len(rows_with_missing)} row(s) with missing values", end="")
+    # Only list the first few rows individually (huge files can have thousands)
+    if len(rows_with_missing) > args.max_rows:
+        print(f" (showing first {args.max_rows})", end="")
+    print(":\n")
     
-    for idx, (i, row) in enumerate(rows_with_missing.iterrows(), 1):
+    for idx, (i, row) in enumerate(rows_with_missing.head(args.max_rows).iterrows(), 1):
         print(f"   ROW {idx} (Index: {i}):")
         print(f"   {'-' * 76}")
         
@@ -3,18 +3,32 @@ prep_data.py: Transform raw Spotify track data into processed story.json for the
 
 This script:
 1. Loads 114,000 Spotify tracks from raw CSV
-2. Cleans and filters data
+2. Validates every row against a declarative schema (failures -> quarantine file), cleans and filters data
 3. Calculates statistics: popularity bins, feature comparisons, genre fingerprints
 4. Generates effect sizes (Cohen's d) to identify which audio features separate hits from non-hits
-5. Outputs JSON file used by index.html + js/charts.js for visualization
+5. Computes full Pearson + Spearman correlation matrices across all numeric features
+6. Trains a regularized logistic regression (hit probability) with mini-batch updates
+7. Pre-bins chart data (2D grids, hit/non-hit curves, downsampled series) into a fixed-size file
+8. Bootstraps confidence intervals for effect sizes and genre overrepresentation ratios
+9. Outputs JSON file used by index.html + js/charts.js for visualization
+   (+ a columnar side file with per-track hit probabilities)
+
+If neither the raw CSV nor this script changed since the last run (see STAMP),
+the script exits right away without importing pandas/numpy. Use --force to rebuild anyway.
 """
 
+import argparse
+import hashlib
 import json
 import math
+import os
+import re
 from pathlib import Path
 
-import numpy as np
-import pandas as pd
+# numpy / pandas are imported lazily (load_heavy_modules) so the
+# "nothing changed" path does not pay for them
+np = None
+pd = None
 
 # ========================
 # FILE PATHS & SETUP
@@ -23,8 +37,196 @@ import pandas as pd
 RAW = Path("data/raw/spotify_tracks.csv")
 # Output: processed JSON file that the website loads
 OUT = Path("data/processed/story.json")
-# Create output directory if it doesn't exist
-OUT.parent.mkdir(parents=True, exist_ok=True)
+
+# Fingerprint of the last successful run (input CSV + pipeline code + outputs written)
+STAMP = Path("data/processed/.prep_stamp.json")
+# Command line options that change the outputs (hashed into the stamp);
+# --workers / --force / --benchmark only change how the run is executed
+OUTPUT_ARGS = ("bootstrap_reps",)
+
+# Rows that fail the schema below are written here (with reasons) instead of being analyzed
+QUARANTINE_OUT = Path("data/processed/quarantine.csv")
+
+# ========================
+# INPUT SCHEMA
+# ========================
+# One entry per column we use: expected type, allowed range (inclusive) and
+# whether missing values are acceptable. All rules are checked together in a
+# single vectorized pass right after loading (see validate_rows).
+SCHEMA = {
+    "track_id":         {"type": "str", "nullable": False},
+    "track_name":       {"type": "str", "nullable": False},
+    "artists":          {"type": "str", "nullable": False},
+    "album_name":       {"type": "str", "nullable": True},
+    "popularity":       {"type": "number", "min": 0, "max": 100, "nullable": False},
+    "duration_ms":      {"type": "number", "min": 1_000, "max": 7_200_000, "nullable": False},  # 1 s .. 2 h
+    "explicit":         {"type": "bool", "nullable": True},
+    "danceability":     {"type": "number", "min": 0, "max": 1, "nullable": True},
+    "energy":           {"type": "number", "min": 0, "max": 1, "nullable": True},
+    "valence":          {"type": "number", "min": 0, "max": 1, "nullable": True},
+    "tempo":            {"type": "number", "min": 0, "max": 300, "nullable": True},
+    "acousticness":     {"type": "number", "min": 0, "max": 1, "nullable": True},
+    "instrumentalness": {"type": "number", "min": 0, "max": 1, "nullable": True},
+    "liveness":         {"type": "number", "min": 0, "max": 1, "nullable": True},
+    "speechiness":      {"type": "number", "min": 0, "max": 1, "nullable": True},
+    "loudness":         {"type": "number", "min": -60, "max": 5, "nullable": True},
+    "key":              {"type": "number", "min": -1, "max": 11, "nullable": True},  # -1 = no key detected
+    "mode":             {"type": "number", "min": 0, "max": 1, "nullable": True},
+    "time_signature":   {"type": "number", "min": 0, "max": 7, "nullable": True},
+    "track_genre":      {"type": "str", "nullable": False},
+}
+
+# Rows per matrix multiply when accumulating correlation cross-products.
+# Keeps memory flat (chunk x features + per-feature value tables) as the catalog grows.
+CORR_CHUNK_ROWS = 1_000_000
+
+# A JSON array holding only numbers / nulls, as laid out by json.dumps(indent=...):
+# one element per line (string values never contain a raw newline, so never match)
+NUMBER_LIST = re.compile(r"\[\n\s*((?:-?[\d.eE+-]+|null)(?:,\n\s*(?:-?[\d.eE+-]+|null))*)\n\s*\]")
+
+# Hit probability model: per-track scores go into a columnar side file
+# (Parquet if pyarrow is installed, .npz with one array per column otherwise)
+SCORES_OUT = Path("data/processed/hit_scores.parquet")
+MODEL_BATCH_ROWS = 2048         # Rows per gradient update
+SCORE_BATCH_ROWS = 1_000_000    # Rows per vectorized scoring batch
+MODEL_HOLDOUT_SHARE = 0.2       # Share of tracks held out for AUC / calibration (never used in training)
+MODEL_VALIDATION_SHARE = 0.1    # Share of tracks used only for early stopping
+MODEL_L2 = 1e-3                 # Ridge penalty on the standardized coefficients
+
+# Representative tracks: top-k most popular per popularity band / genre (plus one medoid)
+EXEMPLARS_TOP_K = 3
+
+# Pre-aggregated chart data: payload size depends only on these settings,
+# never on the number of tracks
+CHARTS_OUT = Path("data/processed/charts.json")
+CHART_GRID_LEVELS = (50, 25, 10)   # popularity x feature grid resolutions (each divides the first)
+CHART_CURVE_BINS = 100             # bins for hit / non-hit histogram + KDE curves
+CHART_SERIES_POINTS = 500          # points kept by LTTB downsampling
+# Bootstrap confidence intervals (Poisson-weighted resamples, drawn in batches)
+BOOTSTRAP_REPLICATES = 1000
+BOOTSTRAP_CI = 0.95
+BOOTSTRAP_BATCH = 100               # replicates per weight matrix
+BOOTSTRAP_BATCH_BYTES = 64_000_000       # peak kernel memory per batch (one batch per worker at a time)
+BOOTSTRAP_POOL_MIN_BYTES = 320_000_000   # use a process pool once replicates x bytes per replicate reaches this
+# Fixed value domains so bins are comparable between snapshots (values outside are clipped)
+FEATURE_DOMAINS = {
+    "popularity": (0.0, 100.0),
+    "tempo": (0.0, 250.0),
+    "loudness": (-60.0, 5.0),
+    "duration_min": (0.0, 15.0),
+}
+
+
+def load_heavy_modules():
+    """Import numpy and pandas on first use and publish them as the module-level np / pd."""
+    global np, pd
+    if np is None:
+        import numpy
+        import pandas
+        np, pd = numpy, pandas
+
+
+def file_sha256(path, block_size=1 << 20):
+    """SHA-256 of a file, read in 1 MB blocks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for block in iter(lambda: fh.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def code_fingerprint():
+    """Hash of this script: covers the pipeline code and every parameter constant above."""
+    return hashlib.sha256(Path(__file__).read_bytes()).hexdigest()
+
+
+def params_fingerprint(args):
+    """Hash of the output-affecting command line options (OUTPUT_ARGS)."""
+    params = {name: getattr(args, name) for name in OUTPUT_ARGS}
+    return hashlib.sha256(json.dumps(params, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def is_up_to_date(args):
+    """
+    Check the stamp file to see whether the last run's outputs are still current.
+
+    Cheap checks first: code and parameter hashes, outputs unchanged since they were written
+    (present, same size and mtime), CSV size and mtime. Only if
+    the CSV was touched (mtime changed, same size) is its content hashed; if the
+    content is unchanged the stamp is refreshed and the run is still a no-op.
+
+    Args:
+        args: Parsed command line options
+
+    Returns:
+        bool: True if nothing needs to be recomputed
+    """
+    try:
+        stamp = json.loads(STAMP.read_text(encoding="utf-8"))
+        st = RAW.stat()
+    except (OSError, ValueError):
+        return False
+
+    csv = stamp.get("csv", {})
+    if stamp.get("code_sha256") != code_fingerprint() or csv.get("path") != RAW.as_posix():
+        return False
+    if stamp.get("params_sha256") != params_fingerprint(args):
+        return False
+    for out in stamp.get("outputs", []):
+        try:
+            out_st = Path(out["path"]).stat()
+        except (OSError, KeyError, TypeError):
+            return False
+        if out.get("size") != out_st.st_size or out.get("mtime_ns") != out_st.st_mtime_ns:
+            return False
+    if csv.get("size") != st.st_size:
+        return False
+    if csv.get("mtime_ns") == st.st_mtime_ns:
+        return True
+
+    if csv.get("sha256") != file_sha256(RAW):
+        return False
+    csv["mtime_ns"] = st.st_mtime_ns
+    STAMP.write_text(json.dumps(stamp, indent=2), encoding="utf-8")
+    return True
+
+
+def write_stamp(args, outputs):
+    """Record the input/code/parameter fingerprint after a successful run."""
+    st = RAW.stat()
+    stamp = {
+        "csv": {
+            "path": RAW.as_posix(),
+            "size": st.st_size,
+            "mtime_ns": st.st_mtime_ns,
+            "sha256": file_sha256(RAW)
+        },
+        "code_sha256": code_fingerprint(),
+        "params_sha256": params_fingerprint(args),
+        "outputs": [
+            {"path": Path(p).as_posix(), "size": Path(p).stat().st_size, "mtime_ns": Path(p).stat().st_mtime_ns}
+            for p in outputs
+        ]
+    }
+    STAMP.write_text(json.dumps(stamp, indent=2), encoding="utf-8")
+
+
+def parse_args():
+    """Command line options."""
+    parser = argparse.ArgumentParser(description="Build data/processed/story.json from the raw Spotify CSV.")
+    parser.add_argument("--force", action="store_true",
+                        help="recompute even if the input CSV and the script are unchanged")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="processes for the analysis sections and the bootstrap (default: sections run in "
+                             "this process, the bootstrap uses all cores for large resamples)")
+    parser.add_argument("--bootstrap-reps", type=int, default=BOOTSTRAP_REPLICATES,
+                        help=f"bootstrap replicates per confidence interval (default: {BOOTSTRAP_REPLICATES})")
+    parser.add_argument("--benchmark", action="store_true",
+                        help="run the analysis sections serially and in parallel and report speedup + memory")
+    args = parser.parse_args()
+    if args.bootstrap_reps < 1:
+        parser.error("--bootstrap-reps must be at least 1")
+    return args
 
 
 def cohen_d(a, b):
@@ -66,535 +268,1605 @@ def cohen_d(a, b):
     return float((a.mean() - b.mean()) / pooled)
 
 
-# ========================
-# LOAD & CLEAN DATA
-# ========================
-# Read the CSV file into a pandas DataFrame
-df = pd.read_csv(RAW)
-
-# Select only the columns we need (ignore the rest)
-needed = [
-    "track_id", "track_name", "artists", "album_name",
-    "popularity", "duration_ms", "explicit",
-    "danceability", "energy", "valence", "tempo",
-    "acousticness", "instrumentalness", "liveness", "speechiness",
-    "loudness", "key", "mode", "time_signature",
-    "track_genre"
-]
-cols = [c for c in needed if c in df.columns]
-df = df[cols].copy()
-
-# Remove rows with missing critical values
-df = df.dropna(subset=["popularity", "duration_ms", "track_genre"])
-print(f"Loaded {len(df):,} tracks.")
+def validate_rows(frame, schema=SCHEMA):
+    """
+    Check every row against the schema in one vectorized pass.
 
-# ========================
-# IDENTIFY DUPLICATES (same track_name + artists)
-# ========================
-# Find rows that have the same track_name AND artists
-duplicates_mask = df.duplicated(subset=["track_name", "artists"], keep=False)
-n_duplicates_before = duplicates_mask.sum()
+    Numeric and boolean columns are coerced in place (so later steps work on
+    clean dtypes); every rule produces one boolean failure mask, and the masks
+    are stacked into a single rows x rules matrix.
 
-if n_duplicates_before > 0:
-    print(f"\n🔍 Found {n_duplicates_before} rows that are duplicates (same track_name + artists)")
-    
-    # Show which columns differ among duplicates
-    duplicate_rows = df[duplicates_mask].sort_values(["track_name", "artists"])
-    
-    print("\nSample duplicate entries:")
-    print("=" * 100)
-    
-    # Show first few duplicate sets
-    for track_name in duplicate_rows["track_name"].unique()[:3]:  # Show first 3 duplicates
-        dups = duplicate_rows[duplicate_rows["track_name"] == track_name]
-        print(f"\n📌 Track: '{track_name}'")
-        
-        # Find which columns differ
-        different_cols = []
-        for col in df.columns:
-            if len(dups[col].unique()) > 1:  # Column has different values
-                different_cols.append(col)
-        
-        if different_cols:
-            print(f"   Columns that differ: {', '.join(different_cols)}")
-            for col in different_cols:
-                print(f"      {col}: {list(dups[col].unique())}")
-        else:
-            print(f"   All columns are identical (exact duplicate)")
-    
-    print("\n" + "=" * 100)
+    Rules per column: "<col>:null" (missing but not nullable), "<col>:type"
+    (present but not parseable as the declared type) and "<col>:range"
+    (outside min/max).
 
-# ========================
-# MERGE DUPLICATES WITH RULES
-# ========================
-# Audio features to average
-audio_features_to_avg = [
-    "popularity", "danceability", "energy", "valence", "tempo",
-    "acousticness", "instrumentalness", "liveness", "speechiness", "loudness"
-]
-
-# Fields that if different, mean we should keep rows separate
-# Note: do NOT keep separate when `track_id` differs — we'll take the first `track_id` instead
-keep_separate_if_different = ["duration_ms", "explicit"]
-
-print("🔄 Merging duplicates ...")
-
-# Check for rows that should be kept separate (different track_id, duration, or explicit)
-df["_should_keep_separate"] = False
-
-for idx, group_df in df.groupby(["track_name", "artists"]):
-    if len(group_df) > 1:  # Only check groups with duplicates
-        for col in keep_separate_if_different:
-            if col in group_df.columns and len(group_df[col].unique()) > 1:
-                # Mark these rows to keep separate
-                df.loc[group_df.index, "_should_keep_separate"] = True
+    Args:
+        frame: DataFrame straight from the CSV (modified in place for coercions)
+        schema: Column rules, see SCHEMA
+
+    Returns:
+        tuple: (valid_mask, rule_counts dict, reasons list for the failing rows)
+    """
+    rule_names = []
+    masks = []
+    for col, rule in schema.items():
+        if col not in frame.columns:
+            continue
+        raw = frame[col]
+        missing = raw.isna().to_numpy()
+
+        if rule["type"] == "number":
+            values = pd.to_numeric(raw, errors="coerce")
+            frame[col] = values
+            masks.append(values.isna().to_numpy() & ~missing)
+            rule_names.append(f"{col}:type")
+            v = values.to_numpy(dtype=float)
+            with np.errstate(invalid="ignore"):
+                out = np.zeros(len(v), dtype=bool)
+                if "min" in rule:
+                    out |= v < rule["min"]
+                if "max" in rule:
+                    out |= v > rule["max"]
+            masks.append(out)
+            rule_names.append(f"{col}:range")
+        elif rule["type"] == "bool" and raw.dtype != bool:
+            if pd.api.types.is_numeric_dtype(raw):
+                # 0/1 flags; a single blank cell makes pandas read them as float64 (1.0 / 0.0)
+                values = pd.to_numeric(raw, errors="coerce")
+                parsed_ok = values.isin([0, 1])
+                flag = values.eq(1)
+            else:
+                text = raw.astype(str).str.strip().str.lower()
+                parsed_ok = text.isin(["true", "1", "false", "0"])
+                flag = text.isin(["true", "1"])
+            masks.append(~parsed_ok.to_numpy() & ~missing)
+            rule_names.append(f"{col}:type")
+            frame[col] = flag.to_numpy(dtype=bool)
+
+        if not rule.get("nullable", True):
+            masks.append(missing)
+            rule_names.append(f"{col}:null")
+
+    if not masks:
+        return np.ones(len(frame), dtype=bool), {}, []
+
+    fails = np.column_stack(masks)
+    valid = ~fails.any(axis=1)
+    counts = fails.sum(axis=0)
+    rule_counts = {name: int(c) for name, c in zip(rule_names, counts) if c > 0}
+    names = np.asarray(rule_names)
+    reasons = [";".join(names[row]) for row in fails[~valid]]
+    return valid, rule_counts, reasons
+
+
+def feature_chunks(frame, cols, chunk_rows=CORR_CHUNK_ROWS):
+    """
+    Yield frame[cols] as float64 blocks of chunk_rows rows, complete rows only.
+
+    Only one block is ever converted at a time, so the caller never holds a
+    full float copy of the selected columns.
+
+    Args:
+        frame: DataFrame containing the numeric columns
+        cols: Column names to extract (rows missing any of them are skipped)
+        chunk_rows: Number of rows per block
+
+    Yields:
+        np.ndarray: 2D float array (rows = tracks, columns = cols)
+    """
+    idx = frame.columns.get_indexer(cols)
+    for start in range(0, len(frame), chunk_rows):
+        X = frame.iloc[start:start + chunk_rows, idx].to_numpy(dtype=np.float64, na_value=np.nan)
+        yield X[~np.isnan(X).any(axis=1)]
+
+
+def merge_value_counts(values, counts, new):
+    """
+    Fold the distinct values of one block of a column into running (value, count) tables.
+
+    Args:
+        values: Sorted distinct values seen so far (None for the first block)
+        counts: Occurrences of each of those values
+        new: 1D array of the block's values
+
+    Returns:
+        tuple: (values, counts), sorted by value
+    """
+    u, c = np.unique(new, return_counts=True)
+    if values is None:
+        return u, c
+    merged, inverse = np.unique(np.concatenate([values, u]), return_inverse=True)
+    return merged, np.bincount(inverse, weights=np.concatenate([counts, c])).astype(np.int64)
+
+
+def cross_product_to_corr(acc):
+    """Turn a centered cross-product matrix into a correlation matrix."""
+    sd = np.sqrt(np.diag(acc))
+    # Constant columns would divide by zero -> treat them as uncorrelated instead
+    sd[sd == 0] = 1.0
+    corr = np.clip(acc / np.outer(sd, sd), -1.0, 1.0)
+    np.fill_diagonal(corr, 1.0)
+    return corr
+
+
+def correlation_matrices(frame, cols, chunk_rows=CORR_CHUNK_ROWS):
+    """
+    Calculate the full Pearson and Spearman correlation matrices for the given columns.
+
+    Both come from moments accumulated over row blocks of the frame, in two passes:
+      1. count the complete rows, sum each column, and build a (value, count)
+         table per column
+      2. accumulate the centered cross products Z^T Z of the raw values (Pearson)
+         and of their average ranks (Spearman), one BLAS multiply per block
+
+    A value's average rank is read off its column's table (values below it +
+    half its ties), so no full-length rank column is ever built. Memory is one
+    block plus the tables, which grow with the number of distinct values per
+    feature, not with the number of tracks.
+
+    Args:
+        frame: DataFrame containing the numeric columns
+        cols: Column names to correlate (rows missing any of them are skipped)
+        chunk_rows: Number of rows per block
+
+    Returns:
+        tuple: (pearson, spearman, n_rows_used)
+    """
+    k = len(cols)
+    n = 0
+    total = np.zeros(k)
+    tables = [(None, None)] * k
+    for X in feature_chunks(frame, cols, chunk_rows):
+        n += len(X)
+        total += X.sum(axis=0)
+        tables = [merge_value_counts(v, c, X[:, j]) for j, (v, c) in enumerate(tables)]
+    if n < 2:
+        return np.full((k, k), np.nan), np.full((k, k), np.nan), n
+
+    mu = total / n
+    # Average rank of each distinct value (1-based, ties share the mean rank)
+    mean_ranks = [np.cumsum(c) - c + (c + 1) / 2.0 for _, c in tables]
+    rank_mu = (n + 1) / 2.0
+
+    acc_values = np.zeros((k, k))
+    acc_ranks = np.zeros((k, k))
+    for X in feature_chunks(frame, cols, chunk_rows):
+        Z = X - mu
+        acc_values += Z.T @ Z
+        R = np.column_stack([
+            mean_ranks[j][np.searchsorted(tables[j][0], X[:, j])] for j in range(k)
+        ]) - rank_mu
+        acc_ranks += R.T @ R
+
+    return cross_product_to_corr(acc_values), cross_product_to_corr(acc_ranks), n
+
+
+def float32_rows(matrix):
+    """
+    Convert a 2D array into compact nested lists at float32 precision for JSON.
+
+    Args:
+        matrix: 2D numpy array
+
+    Returns:
+        list: Nested lists of floats (6 significant digits, NaN -> None)
+    """
+    return [
+        [float(f"{v:.6g}") if np.isfinite(v) else None for v in row]
+        for row in np.asarray(matrix, dtype=np.float32)
+    ]
+
+
+def float32_flat(matrix):
+    """
+    Convert a 2D array into a flat row-major list plus its shape for JSON.
+
+    Written through dumps_indented, the matrix takes one line instead of k * k.
+
+    Args:
+        matrix: 2D numpy array
+
+    Returns:
+        dict: {"shape": [rows, cols], "values": flat list (same rounding as float32_rows)}
+    """
+    matrix = np.asarray(matrix)
+    return {"shape": list(matrix.shape), "values": float32_rows(matrix.reshape(1, -1))[0]}
+
+
+def dumps_indented(obj):
+    """
+    json.dumps(obj, indent=2), but with every number-only list kept on one line.
+
+    Args:
+        obj: JSON-serializable object
+
+    Returns:
+        str: Indented JSON text
+    """
+    text = json.dumps(obj, indent=2)
+    return NUMBER_LIST.sub(lambda m: "[" + ", ".join(re.split(r",\n\s*", m.group(1))) + "]", text)
+
+
+def sigmoid(z):
+    """Numerically safe logistic function (works on whole arrays)."""
+    return 1.0 / (1.0 + np.exp(-np.clip(z, -35.0, 35.0)))
+
+
+def iter_blocks(n, block_rows, rng=None):
+    """
+    Yield (start, stop) slices covering n rows in blocks of block_rows.
+
+    With an rng the block order is shuffled, so each epoch sees the data in a
+    different order without ever materializing a full row permutation.
+    """
+    starts = np.arange(0, n, block_rows)
+    if rng is not None:
+        starts = rng.permutation(starts)
+    for start in starts:
+        yield int(start), int(min(start + block_rows, n))
+
+
+def train_logistic(train_batches, val_batches, n_features, l2=1e-3, lr=0.5,
+                   max_epochs=50, patience=3, tol=1e-4):
+    """
+    Fit an L2-regularized logistic regression with mini-batch gradient descent.
+
+    The data is only ever seen one batch at a time, so the same loop works for
+    catalogs that do not fit in memory (e.g. batches streamed from disk).
+    Training stops early once the validation log loss stops improving.
+
+    Args:
+        train_batches: Callable returning an iterator of (X, y) training batches (one epoch)
+        val_batches: Callable returning an iterator of (X, y) validation batches
+        n_features: Number of columns in X
+        l2: Ridge penalty on the coefficients (not the intercept)
+        lr: Learning rate
+        max_epochs: Upper bound on passes over the training data
+        patience: Epochs without improvement before stopping
+        tol: Minimum decrease in validation loss that counts as improvement
+
+    Returns:
+        dict: weights, intercept, epochs run and best validation log loss
+    """
+    w = np.zeros(n_features)
+    b = 0.0
+    best = {"weights": w.copy(), "intercept": b, "val_log_loss": np.inf, "epochs": 0}
+    stale = 0
+
+    for epoch in range(1, max_epochs + 1):
+        for X, y in train_batches():
+            p = sigmoid(X @ w + b)
+            err = p - y
+            w -= lr * (X.T @ err / len(y) + l2 * w)
+            b -= lr * float(err.mean())
+
+        # Validation loss, accumulated batch by batch
+        loss, n = 0.0, 0
+        for X, y in val_batches():
+            p = np.clip(sigmoid(X @ w + b), 1e-12, 1 - 1e-12)
+            loss -= float(np.sum(y * np.log(p) + (1 - y) * np.log(1 - p)))
+            n += len(y)
+        loss = loss / n if n else np.inf
+
+        if loss < best["val_log_loss"] - tol:
+            best = {"weights": w.copy(), "intercept": b, "val_log_loss": loss, "epochs": epoch}
+            stale = 0
+        else:
+            stale += 1
+            if stale >= patience:
                 break
 
-# Split into two: mergeable and non-mergeable
-mergeable_df = df[~df["_should_keep_separate"]].copy()
-keep_separate_df = df[df["_should_keep_separate"]].copy()
+    return best
 
-# Merge the mergeable ones using agg
-if len(mergeable_df) > 0:
-    # Create aggregation dict
-    agg_dict = {}
-    
-    # Average these features
-    for feat in audio_features_to_avg:
-        if feat in mergeable_df.columns:
-            agg_dict[feat] = "mean"
-    
-    # Concatenate genres
-    if "track_genre" in mergeable_df.columns:
-        agg_dict["track_genre"] = lambda x: ";".join(sorted(set(";".join(x.astype(str)).split(";"))))
-    
-    # Concatenate albums
-    if "album_name" in mergeable_df.columns:
-        agg_dict["album_name"] = lambda x: ";".join(sorted(set(x.dropna().astype(str))))
-    
-    # Keep first value for other columns
-    for col in mergeable_df.columns:
-        if col not in agg_dict and col != "_should_keep_separate":
-            agg_dict[col] = "first"
-    
-    # Group and aggregate
-    merged = mergeable_df.groupby(["track_name", "artists"], as_index=False).agg(agg_dict)
-    
-    # Combine: merged + kept_separate
-    # Only drop the helper column if it exists (avoid KeyError)
-    if "_should_keep_separate" in keep_separate_df.columns:
-        keep_separate_df = keep_separate_df.drop(columns=["_should_keep_separate"])
-    if "_should_keep_separate" in merged.columns:
-        merged = merged.drop(columns=["_should_keep_separate"])
-    df = pd.concat([merged, keep_separate_df], ignore_index=True)
-else:
-    # Drop helper column only if present
-    if "_should_keep_separate" in keep_separate_df.columns:
-        df = keep_separate_df.drop(columns=["_should_keep_separate"])
-    else:
-        df = keep_separate_df
-
-if n_duplicates_before > 0:
-    print(f"\n✓ Processed {n_duplicates_before} duplicate rows")
-    print(f"  Final track count: {len(df):,}")
-    print(f"  Rules applied:")
-    print(f"    - track_genre: concatenated with ';'")
-    print(f"    - album_name: concatenated with ';'")
-    print(f"    - Audio features: averaged")
-    print(f"    - If duration_ms/explicit differ: kept separate")
-    print(f"    - If track_id differs: first track_id is used")
-
-# Convert duration from milliseconds to minutes (easier to work with)
-df["duration_min"] = df["duration_ms"] / 60000.0
-
-# Extract unique artist count (split by ";" for multi-artist tracks)
-artist_sets = df["artists"].astype(str).str.split(";")
-unique_artists = len(set(a.strip() for sub in artist_sets for a in sub if a.strip()))
-
-# Explode multi-genre entries early so genre-level analyses can use it
-df_genres = df.copy()
-if "track_genre" in df_genres.columns:
-    df_genres["track_genre"] = df_genres["track_genre"].astype(str).str.split(";")
-    df_genres = df_genres.explode("track_genre")
-    df_genres["track_genre"] = df_genres["track_genre"].astype(str).str.strip()
-else:
-    df_genres = df_genres.assign(track_genre="")
-
-# Basic dataset stats
-n_tracks = int(len(df))
-# Number of unique genres (from exploded rows so multi-genre tracks count per genre)
-n_genres = int(df_genres["track_genre"].nunique())
-
-# Explicit track rate (% of tracks marked as explicit)
-explicit_rate = float(np.mean(df["explicit"].astype(int))) if "explicit" in df.columns else None
 
+def roc_auc(y_true, scores):
+    """
+    Calculate ROC AUC via the rank-sum (Mann-Whitney U) formula, fully vectorized.
 
-# ========================
-# SECTION 1: INTRO STATS
-# ========================
-# Select 3 representative tracks for the cold open:
-# 1. Top hit (popularity ~100)
-# 2. Median track (popularity ~34)
-# 3. Long tail track (popularity < 10)
-feature_cols_for_examples = [
-    "track_id", "track_name", "artists", "track_genre", "popularity",
-    "danceability", "energy", "loudness", "instrumentalness",
-    "acousticness", "duration_min", "valence", "speechiness",
-    "liveness", "tempo"
-]
-available_cols = [col for col in feature_cols_for_examples if col in df.columns]
-
-# Get median popularity value
-median_pop = df["popularity"].median()
-
-# Select representative songs
-top_hit = df.sort_values("popularity", ascending=False).head(1)[available_cols].to_dict(orient="records")[0]
-
-# For median: exclude ASMR/sleep/ambient genres to get a real music track
-median_candidates = df[~df["track_genre"].str.contains("sleep|asmr|ambient|white-noise", case=False, na=False)]
-median_track = median_candidates.iloc[(median_candidates["popularity"] - median_pop).abs().argsort()[:1]][available_cols].to_dict(orient="records")[0] if len(median_candidates) > 0 else df.iloc[(df["popularity"] - median_pop).abs().argsort()[:1]][available_cols].to_dict(orient="records")[0]
-
-# For long tail: pick a low-popularity track (excluding sleep/ASMR)
-long_tail_candidates = df[(df["popularity"] < 10) & ~df["track_genre"].str.contains("sleep|asmr|ambient|white-noise", case=False, na=False)]
-long_tail = long_tail_candidates.sample(n=1, random_state=42)[available_cols].to_dict(orient="records")[0] if len(long_tail_candidates) > 0 else df.sort_values("popularity").head(1)[available_cols].to_dict(orient="records")[0]
-
-# Also get top 10 hits for the dot plot visualization
-top_10_hits = (
-    df.sort_values("popularity", ascending=False)
-      .head(10)[available_cols]
-      .to_dict(orient="records")
-)
-
-examples = [top_hit, median_track, long_tail] + top_10_hits
-
-# Compile intro section: overview statistics
-intro = {
-    "tracks": n_tracks,                                    # Total tracks analyzed
-    "unique_artists": unique_artists,                      # How many different artists
-    "unique_genres": n_genres,                             # How many different genres
-    "explicit_rate": explicit_rate,                        # % of tracks that are explicit
-    "median_popularity": float(df["popularity"].median()), # Middle popularity score
-    "median_duration_min": float(df["duration_min"].median()), # Middle song length
-    "median_tempo": float(df["tempo"].median()) if "tempo" in df.columns else None,
-    "example_hits": examples                               # Top 10 tracks by popularity
-}
+    Returns:
+        float: AUC (None if only one class is present)
+    """
+    y_true = np.asarray(y_true, dtype=bool)
+    n_pos = int(y_true.sum())
+    n_neg = len(y_true) - n_pos
+    if n_pos == 0 or n_neg == 0:
+        return None
+    ranks = pd.Series(scores).rank(method="average").to_numpy()
+    return float((ranks[y_true].sum() - n_pos * (n_pos + 1) / 2) / (n_pos * n_neg))
 
 
-# ========================
-# SECTION 2: POPULARITY SPECTRUM
-# ========================
-# Divide popularity (0-100) into 5-point bins (0-4, 5-9, 10-14, ..., 95-99, 100)
-bins = list(range(0, 105, 5))
-labels = [f"{bins[i]}-{bins[i+1]-1}" for i in range(len(bins) - 1)]
-df["pop_bin_5"] = pd.cut(df["popularity"], bins=[-1] + bins[1:], labels=labels)
-
-# Count tracks in each bin (histogram)
-hist = (
-    df["pop_bin_5"].value_counts()
-      .reindex(labels)
-      .fillna(0)
-      .astype(int)
-)
-pop_hist = [{"bin": k, "count": int(v)} for k, v in hist.items()]
-
-# Calculate key percentiles (where are the cutoffs for top 10%, 25%, etc.)
-quantiles = {str(q): float(df["popularity"].quantile(q)) for q in [0.1, 0.25, 0.5, 0.75, 0.9]}
-
-# Define "hit" = top 10% by popularity
-hit_threshold = float(df["popularity"].quantile(0.90))
-df["is_hit"] = df["popularity"] >= hit_threshold
-
-# Also create 10-point bands for feature analysis (easier to plot trends)
-band_labels = ["0-9","10-19","20-29","30-39","40-49","50-59","60-69","70-79","80-89","90-100"]
-df["pop_band_10"] = pd.cut(
-    df["popularity"],
-    bins=[-1,9,19,29,39,49,59,69,79,89,100],
-    labels=band_labels
-)
+def calibration_bins(y_true, probs, n_bins=10):
+    """
+    Compare predicted probabilities with observed hit rates in equal-width bins.
 
+    Returns:
+        list: One dict per non-empty bin (bin label, count, mean predicted, observed rate)
+    """
+    y_true = np.asarray(y_true, dtype=float)
+    idx = np.minimum((probs * n_bins).astype(int), n_bins - 1)
+    counts = np.bincount(idx, minlength=n_bins)
+    pred_sum = np.bincount(idx, weights=probs, minlength=n_bins)
+    hit_sum = np.bincount(idx, weights=y_true, minlength=n_bins)
+    return [
+        {
+            "bin": f"{i / n_bins:.1f}-{(i + 1) / n_bins:.1f}",
+            "count": int(counts[i]),
+            "mean_predicted": float(pred_sum[i] / counts[i]),
+            "observed_rate": float(hit_sum[i] / counts[i])
+        }
+        for i in range(n_bins) if counts[i] > 0
+    ]
+
+
+def group_exemplars(frame, key, features, cols, k=3):
+    """
+    Pick representative tracks for every group (popularity band, genre, ...).
 
-# ========================
-# SECTION 3: FEATURE ANATOMY
-# ========================
-# These are the audio features Spotify measures for each track
-feature_cols = [
-    "danceability", "energy", "valence", "tempo",
-    "acousticness", "instrumentalness", "liveness", "speechiness",
-    "loudness", "duration_min"
-]
-feature_cols = [c for c in feature_cols if c in df.columns]
-
-# Split data: top 10% (hits) vs bottom 10% (non-hits)
-top = df[df["popularity"] >= df["popularity"].quantile(0.90)]
-bottom = df[df["popularity"] <= df["popularity"].quantile(0.10)]
-
-# For each audio feature, calculate difference between hits and non-hits
-anatomy = []
-for f in feature_cols:
-    a = top[f].dropna().values
-    b = bottom[f].dropna().values
-    anatomy.append({
-        "feature": f,
-        "mean_top10": float(np.mean(a)) if len(a) else None,    # Average value for hits
-        "mean_bottom10": float(np.mean(b)) if len(b) else None,  # Average value for non-hits
-        "delta": float(np.mean(a) - np.mean(b)) if len(a) and len(b) else None,  # Raw difference
-        "cohen_d": cohen_d(a, b)  # Standardized difference (effect size)
-    })
-# Sort by strongest effect (largest |cohen_d|)
-anatomy = sorted(anatomy, key=lambda x: abs(x["cohen_d"]), reverse=True)
-
-# Calculate mean features for each popularity band (to show trends)
-feature_by_band = (
-    df.groupby("pop_band_10")[feature_cols]
-      .mean(numeric_only=True)
-      .reset_index()
-)
-feature_by_band = [
-    {"pop_band": str(r["pop_band_10"]), **{c: float(r[c]) for c in feature_cols}}
-    for _, r in feature_by_band.iterrows()
-]
+    The group key is factorized once; group centroids and counts come from
+    bincount over those codes, and the picks use idxmin / nlargest per group,
+    so there is no sort of the full frame and no Python loop over rows.
 
+    Two kinds of exemplars per group:
+    - medoid: the track closest to the group's average (z-scored) audio profile
+    - top: the k most popular tracks in the group
 
-# ========================
-# SECTION 4: GENRE FINGERPRINTS
-# ========================
-# Many tracks have multiple genres separated by ';'. For genre analysis we
-# want to count and analyze a track under each listed genre. Create an
-# exploded view for genre-level statistics so each (track, genre) pair is
-# considered separately.
-TOP_N_GENRES = 12
+    Args:
+        frame: DataFrame with the tracks
+        key: Column to group by
+        features: Numeric columns that define the audio profile
+        cols: Columns to include in each exemplar record
+        k: Number of top tracks per group
 
-# Explode multi-genre entries into one row per genre (trim whitespace)
-df_genres = df.copy()
-if "track_genre" in df_genres.columns:
-    df_genres["track_genre"] = df_genres["track_genre"].astype(str).str.split(";")
-    df_genres = df_genres.explode("track_genre")
-    df_genres["track_genre"] = df_genres["track_genre"].astype(str).str.strip()
-else:
-    df_genres = df_genres.assign(track_genre="")
-
-# Number of unique genres (from exploded rows so multi-genre tracks count per genre)
-n_genres = int(df_genres["track_genre"].nunique())
-
-# For each genre, calculate stats using the exploded rows so a multi-genre
-# track contributes to each of its genres
-genre_stats_all = (
-    df_genres
-      .groupby("track_genre")
-      .agg(
-          count=("track_id", "size"),
-          popularity_mean=("popularity", "mean"),
-          hit_share=("is_hit", "mean"),
-          explicit_rate=("explicit", lambda s: float(np.mean(s.astype(int)))) if "explicit" in df_genres.columns else ("popularity", "mean"),
-          danceability=("danceability", "mean") if "danceability" in df_genres.columns else ("popularity", "mean"),
-          energy=("energy", "mean") if "energy" in df_genres.columns else ("popularity", "mean"),
-          valence=("valence", "mean") if "valence" in df_genres.columns else ("popularity", "mean"),
-          acousticness=("acousticness", "mean") if "acousticness" in df_genres.columns else ("popularity", "mean"),
-          instrumentalness=("instrumentalness", "mean") if "instrumentalness" in df_genres.columns else ("popularity", "mean"),
-          speechiness=("speechiness", "mean") if "speechiness" in df_genres.columns else ("popularity", "mean"),
-          tempo=("tempo", "mean") if "tempo" in df_genres.columns else ("popularity", "mean"),
-          duration_min=("duration_min", "mean"),
-          loudness=("loudness", "mean") if "loudness" in df_genres.columns else ("popularity", "mean"),
-      )
-      .reset_index()
-)
-
-# Compute top genres by highest average popularity
-top_genres = (
-    genre_stats_all.sort_values("popularity_mean", ascending=False)
-      .head(TOP_N_GENRES)["track_genre"]
-      .tolist()
-)
-
-genre_stats = genre_stats_all[genre_stats_all["track_genre"].isin(top_genres)].reset_index(drop=True)
-
-# Calculate Z-scores for each feature in each genre (standardize across genres)
-# Z-score = (value - genre_avg) / genre_std_dev
-# This shows which features are unusually high/low for each genre
-fingerprint_features = [c for c in ["danceability","energy","valence","acousticness","instrumentalness","speechiness","tempo","loudness","duration_min"] if c in genre_stats.columns]
-z_rows = []
-for feat in fingerprint_features:
-    vals = genre_stats[feat].astype(float).values
-    mu = float(np.mean(vals))  # Average across genres
-    sd = float(np.std(vals)) if float(np.std(vals)) != 0 else 1.0  # Spread across genres
-    for _, row in genre_stats.iterrows():
-        z_rows.append({
-            "genre": row["track_genre"],
-            "feature": feat,
-            "z": float((float(row[feat]) - mu) / sd)  # How many std devs away from mean
+    Returns:
+        list: One dict per group (group label, count, medoid record, top records)
+    """
+    codes, groups = pd.factorize(frame[key], sort=True)
+    valid = codes >= 0
+    frame = frame[valid].reset_index(drop=True)
+    codes = codes[valid]
+    if len(frame) == 0:
+        return []
+
+    Z = frame[features].to_numpy(dtype=np.float64)
+    sd = np.nanstd(Z, axis=0)
+    sd[~(sd > 0)] = 1.0
+    Z = np.nan_to_num((Z - np.nanmean(Z, axis=0)) / sd)
+
+    counts = np.bincount(codes, minlength=len(groups))
+    centroids = np.column_stack([
+        np.bincount(codes, weights=Z[:, j], minlength=len(groups)) for j in range(Z.shape[1])
+    ]) / np.maximum(counts, 1)[:, None]
+    dist = ((Z - centroids[codes]) ** 2).sum(axis=1)
+
+    medoid_rows = pd.Series(dist).groupby(codes).idxmin()
+    top_rows = frame["popularity"].groupby(codes).nlargest(k)
+
+    # Only the selected rows are turned into records (a few per group)
+    selected = np.unique(np.concatenate([
+        medoid_rows.to_numpy(),
+        top_rows.index.get_level_values(-1).to_numpy()
+    ]))
+    records = dict(zip(selected, frame.iloc[selected][cols].to_dict(orient="records")))
+    top_by_code = pd.Series(top_rows.index.get_level_values(-1)).groupby(top_rows.index.get_level_values(0)).agg(list)
+
+    out = []
+    for code, label in enumerate(groups):
+        if counts[code] == 0:
+            continue
+        out.append({
+            "group": str(label),
+            "count": int(counts[code]),
+            "medoid": records[medoid_rows[code]],
+            "top": [records[i] for i in top_by_code[code]]
         })
+    return out
 
-# Format genre data for output
-genre_table = []
-for _, r in genre_stats.iterrows():
-    item = {"genre": r["track_genre"], "count": int(r["count"])}
-    for c in ["popularity_mean","explicit_rate","hit_share"] + fingerprint_features:
-        if c in r:
-            item[c] = float(r[c])
-    genre_table.append(item)
 
+def feature_domain(values, feature):
+    """Fixed (lo, hi) range for a feature: 0-1 audio features, known ranges, else 0.5-99.5 percentiles."""
+    if feature in FEATURE_DOMAINS:
+        return FEATURE_DOMAINS[feature]
+    lo, hi = np.nanpercentile(values, [0.5, 99.5]) if len(values) else (0.0, 1.0)
+    if 0.0 <= lo and hi <= 1.0:
+        return (0.0, 1.0)
+    return (float(lo), float(hi) if hi > lo else float(lo) + 1.0)
 
-# ========================
-# SECTION 5: HIT BLUEPRINT
-# ========================
-# Calculate global averages for each audio feature
-global_means = {c: float(df[c].mean()) for c in feature_cols}
 
-# Calculate averages for top 10% (hits)
-hit_means = {c: float(top[c].mean()) for c in feature_cols}
+def bin_index(values, lo, hi, n_bins):
+    """Map values to bin indices 0..n_bins-1 over [lo, hi] (outliers land in the edge bins)."""
+    idx = np.floor((values - lo) / (hi - lo) * n_bins)
+    return np.clip(idx, 0, n_bins - 1).astype(np.int64)
+
+
+def coarsen_grid(grid, n_bins):
+    """Sum a square count grid down to n_bins x n_bins (n_bins must divide its size)."""
+    f = grid.shape[0] // n_bins
+    return grid.reshape(n_bins, f, n_bins, f).sum(axis=(1, 3))
+
+
+def binned_kde(counts, bin_width, n_total, sd):
+    """
+    Gaussian KDE evaluated on histogram bin centers, by convolving the counts.
+
+    Uses Silverman's rule of thumb for the bandwidth. Cost depends on the number
+    of bins only, not on the number of tracks.
+
+    Returns:
+        np.ndarray: Density values (integrate to ~1 over the domain)
+    """
+    if n_total < 2 or not sd > 0:
+        return np.zeros(len(counts))
+    bandwidth = 1.06 * sd * n_total ** (-1 / 5) / bin_width   # in bin units
+    half = int(np.ceil(4 * bandwidth))
+    offsets = np.arange(-half, half + 1)
+    kernel = np.exp(-0.5 * (offsets / bandwidth) ** 2)
+    kernel /= kernel.sum()
+    # "full" + slice keeps the output aligned with the bins even when the
+    # kernel is wider than the histogram ("same" would return the longer of the two)
+    smoothed = np.convolve(counts, kernel, mode="full")[half:half + len(counts)]
+    assert len(smoothed) == len(counts)
+    return smoothed / (n_total * bin_width)
+
+
+def lttb(x, y, n_out):
+    """
+    Largest-Triangle-Three-Buckets downsampling of a line series.
+
+    Keeps the first and last point and, per bucket, the point forming the
+    largest triangle with the previously kept point and the next bucket's mean,
+    so peaks and drops survive even at a few hundred points.
+
+    Returns:
+        tuple: (x, y) numpy arrays with at most n_out points
+    """
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.asarray(x), np.asarray(y)
+
+    edges = np.linspace(1, n - 1, n_out - 1).astype(int)
+    keep = [0]
+    for i in range(n_out - 2):
+        start, stop = edges[i], edges[i + 1]
+        nxt_start, nxt_stop = edges[i + 1], edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[nxt_start:nxt_stop].mean()
+        avg_y = y[nxt_start:nxt_stop].mean()
+        ax, ay = x[keep[-1]], y[keep[-1]]
+        area = np.abs((ax - avg_x) * (y[start:stop] - ay) - (ax - x[start:stop]) * (avg_y - ay))
+        keep.append(start + int(np.argmax(area)))
+    keep.append(n - 1)
+    keep = np.asarray(keep)
+    return x[keep], y[keep]
+
+
+def bootstrap_cohen_d(a, b, n_reps, seed):
+    """
+    Cohen's d for every feature column across a batch of bootstrap replicates.
+
+    Instead of resampling indices, each replicate gets Poisson(1) weights per
+    row; weighted sums for all replicates and features are then two matrix
+    products per group (W @ X and W @ X^2). Missing values only drop out of
+    their own feature.
+
+    Args:
+        a, b: 2D arrays (rows = tracks, columns = features) for the two groups
+        n_reps: Number of replicates in this batch
+        seed: Seed (or SeedSequence) for this batch
+
+    Returns:
+        np.ndarray: n_reps x features matrix of d values
+
+    Memory: about 16 bytes per replicate and row of the larger group (the
+    int64 Poisson draws plus their float64 copy; the groups run one at a time).
+    """
+    rng = np.random.default_rng(seed)
+
+    def weighted_moments(X):
+        valid = ~np.isnan(X)
+        # Centering does not change d but keeps the sums of squares well conditioned
+        Xc = np.where(valid, X - np.nanmean(X, axis=0), 0.0)
+        W = rng.poisson(1.0, size=(n_reps, len(X))).astype(np.float64)
+        n = W @ valid.astype(np.float64)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            mean = (W @ Xc) / n
+            var = ((W @ (Xc * Xc)) - n * mean * mean) / (n - 1)
+        # Add back the centering offset so the means stay comparable between groups
+        return n, mean + np.nanmean(X, axis=0), var
+
+    na, ma, va = weighted_moments(a)
+    nb, mb, vb = weighted_moments(b)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        pooled = np.sqrt(((na - 1) * va + (nb - 1) * vb) / (na + nb - 2))
+        d = (ma - mb) / pooled
+    return np.where(pooled > 0, d, 0.0)
+
+
+def bootstrap_genre_ratio(codes, rows, is_hit, n_genres, n_reps, seed):
+    """
+    Genre overrepresentation ratios (hit share / overall share) across a batch of replicates.
 
-# Calculate the delta (how much higher/lower hits are vs overall avg)
-deltas = {c: float(hit_means[c] - global_means[c]) for c in feature_cols}
+    Poisson weights are drawn per (replicate, track) and gathered onto the
+    exploded (track, genre) pairs through rows, so a multi-genre track is
+    resampled once and counts in all of its genres together. The weights are
+    then folded into per-genre totals with a single bincount over
+    (replicate, genre) codes.
+
+    Args:
+        codes: Integer genre code per (exploded) (track, genre) pair
+        rows: Track row of each pair (index into is_hit)
+        is_hit: Boolean array per track, True if the track is a hit
+        n_genres: Number of distinct genre codes
+        n_reps: Number of replicates in this batch
+        seed: Seed (or SeedSequence) for this batch
+
+    Returns:
+        np.ndarray: n_reps x n_genres matrix of ratios (NaN where undefined)
+
+    Memory: about 16 bytes per replicate and track (Poisson draws + float64
+    copy) plus 24 per replicate and pair (gathered weights, slot codes and
+    hit weights).
+    """
+    rng = np.random.default_rng(seed)
+    W = rng.poisson(1.0, size=(n_reps, len(is_hit))).astype(np.float64)[:, rows]
+    is_hit = is_hit[rows]
+    slots = (np.arange(n_reps)[:, None] * n_genres + codes[None, :]).ravel()
+    size = n_reps * n_genres
+    all_counts = np.bincount(slots, weights=W.ravel(), minlength=size).reshape(n_reps, n_genres)
+    hit_counts = np.bincount(slots, weights=(W * is_hit).ravel(), minlength=size).reshape(n_reps, n_genres)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        overall = all_counts / all_counts.sum(axis=1, keepdims=True)
+        hits = hit_counts / hit_counts.sum(axis=1, keepdims=True)
+        return hits / overall
+
+
+_BOOTSTRAP_TASK = None
+
+
+def _init_bootstrap_worker(kernel, args):
+    """Process pool initializer: receive the data once per worker, not once per batch."""
+    global _BOOTSTRAP_TASK
+    load_heavy_modules()
+    _BOOTSTRAP_TASK = (kernel, args)
+
+
+def _run_bootstrap_batch(n_reps, seed):
+    kernel, args = _BOOTSTRAP_TASK
+    return kernel(*args, n_reps, seed)
+
+
+def bootstrap(kernel, args, rep_bytes, n_reps=BOOTSTRAP_REPLICATES, seed=42, workers=None):
+    """
+    Run a vectorized bootstrap kernel in batches of replicates.
+
+    Batches are sized so the kernel's peak memory for one batch (every array it
+    allocates, not just the weight matrix) stays under BOOTSTRAP_BATCH_BYTES.
+    The size only depends on the data, never on the worker count, and each
+    batch gets its own child seed, so results are identical whether the
+    batches run serially or in a process pool; the pool is used when the total
+    work (replicates x rep_bytes) reaches BOOTSTRAP_POOL_MIN_BYTES and more
+    than one worker is available.
+
+    Args:
+        kernel: bootstrap_cohen_d / bootstrap_genre_ratio (or compatible)
+        args: Data arguments for the kernel (everything before n_reps, seed)
+        rep_bytes: Peak bytes the kernel allocates per replicate (see the kernel's docstring)
+        n_reps: Total number of replicates
+        seed: Base seed
+        workers: Pool size (default: all cores)
+
+    Returns:
+        np.ndarray: Replicates stacked along axis 0
+    """
+    batch = max(1, min(BOOTSTRAP_BATCH, BOOTSTRAP_BATCH_BYTES // max(rep_bytes, 1)))
+    sizes = [min(batch, n_reps - i) for i in range(0, n_reps, batch)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+
+    workers = workers or os.cpu_count() or 1
+    if n_reps * rep_bytes >= BOOTSTRAP_POOL_MIN_BYTES and len(sizes) > 1 and workers > 1:
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(max_workers=min(workers, len(sizes)), initializer=_init_bootstrap_worker,
+                                 initargs=(kernel, args)) as pool:
+            parts = list(pool.map(_run_bootstrap_batch, sizes, seeds))
+    else:
+        parts = [kernel(*args, size, sd) for size, sd in zip(sizes, seeds)]
+    return np.concatenate(parts, axis=0)
+
+
+def percentile_ci(replicates, level=BOOTSTRAP_CI):
+    """Percentile confidence interval per column -> (lower, upper) arrays."""
+    tail = (1 - level) / 2 * 100
+    with np.errstate(invalid="ignore"):
+        lo, hi = np.nanpercentile(replicates, [tail, 100 - tail], axis=0)
+    return lo, hi
+
+
+def write_columnar(frame, path):
+    """
+    Write a DataFrame column by column: Parquet if pyarrow is installed,
+    otherwise a NumPy .npz archive with one array per column (no extra dependency).
+
+    Text columns are stored as fixed-width unicode arrays, so the .npz loads
+    with np.load(path) without allow_pickle.
+
+    Returns:
+        Path: The file that was actually written
+    """
+    try:
+        frame.to_parquet(path, index=False)
+        return path
+    except ImportError:
+        path = path.with_suffix(".npz")
+        np.savez(path, **{
+            col: frame[col].to_numpy(dtype=str) if frame[col].dtype == object or pd.api.types.is_string_dtype(frame[col])
+            else frame[col].to_numpy()
+            for col in frame.columns
+        })
+        return path
 
 
 # ========================
-# SECTION 6: GENRE OVERREPRESENTATION
+# ANALYSIS SECTIONS (run in parallel)
 # ========================
-# Find genres that punch above their weight (more hits than expected by their share)
-# Use exploded genre rows so multi-genre tracks contribute to each genre.
-overall_share = df_genres["track_genre"].value_counts(normalize=True)  # % of all tracks in each genre
-hit_share = df_genres[df_genres["is_hit"]]["track_genre"].value_counts(normalize=True)  # % of hits in each genre
-ratio = (hit_share / overall_share).dropna().sort_values(ascending=False)  # hit_share / overall_share
-
-genre_overrep = []
-for genre, r in ratio.head(10).items():
-    genre_overrep.append({
-        "genre": genre,
-        "ratio": float(r),                            # How many times overrepresented (e.g., 1.5 = 50% more hits)
-        "hit_share": float(hit_share.get(genre, 0.0)),      # % of hits from this genre
-        "overall_share": float(overall_share.get(genre, 0.0))  # % of all tracks from this genre
-    })
-
-# ---------- SECTION 1: Intro + hook ----------
-# (examples already defined above)
-
-intro = {
-    "tracks": n_tracks,
-    "unique_artists": unique_artists,
-    "unique_genres": n_genres,
-    "explicit_rate": explicit_rate,
-    "median_popularity": float(df["popularity"].median()),
-    "median_duration_min": float(df["duration_min"].median()),
-    "median_tempo": float(df["tempo"].median()) if "tempo" in df.columns else None,
-    "example_hits": examples
-}
+# The sections below only read the cleaned columns and never depend on each
+# other, so they can run concurrently. Each one takes
+#   cols:   dict of 1D numpy arrays (in workers: memory-mapped .npy files)
+#   params: small dict of settings (feature lists, genre names, hit threshold)
+# and returns a JSON-ready dict. Results are merged in SECTIONS order, so the
+# output is identical whether they ran serially or in a process pool.
+
+# Popularity (0-100) in 5-point bins, right-inclusive like pd.cut: (-1, 5], (5, 10], ...
+POP_HIST_EDGES = [-1] + list(range(5, 105, 5))
+POP_HIST_LABELS = [f"{b}-{b + 4}" for b in range(0, 100, 5)]
+# 10-point bands for feature trends
+POP_BAND_EDGES = [-1, 9, 19, 29, 39, 49, 59, 69, 79, 89, 100]
+POP_BAND_LABELS = ["0-9", "10-19", "20-29", "30-39", "40-49", "50-59", "60-69", "70-79", "80-89", "90-100"]
+TOP_N_GENRES = 12
 
-# -----------------------------
-# STEP 3: Feature anatomy data
-# (Effect sizes: hit vs non-hit)
-# -----------------------------
 
-# ensure duration_min exists
-if "duration_min" not in df.columns and "duration_ms" in df.columns:
-    df["duration_min"] = df["duration_ms"] / 60000.0
+def cut_codes(values, edges):
+    """Bin index per value like pd.cut(values, edges) (right-inclusive), -1 outside the edges."""
+    idx = np.searchsorted(edges, values, side="left") - 1
+    idx[~((values > edges[0]) & (values <= edges[-1]))] = -1
+    return idx
 
-# define hits as top 10% by popularity
-hit_threshold = float(df["popularity"].quantile(0.90))
-df["is_hit"] = df["popularity"] >= hit_threshold
-
-# Choose the features you want to compare (match your site’s visuals)
-feature_cols = [
-    "danceability", "energy", "valence", "acousticness",
-    "instrumentalness", "liveness", "speechiness",
-    "tempo", "loudness", "duration_min"
-]
-
-hit_df = df[df["is_hit"]]
-non_df = df[~df["is_hit"]]
-
-feature_effects = []
-for col in feature_cols:
-    if col not in df.columns:
-        continue
-
-    x_hit = hit_df[col].dropna()
-    x_non = non_df[col].dropna()
-    if len(x_hit) < 30 or len(x_non) < 30:
-        continue
-
-    m_hit = float(x_hit.mean())
-    m_non = float(x_non.mean())
-    s_hit = float(x_hit.std(ddof=1))
-    s_non = float(x_non.std(ddof=1))
-
-    # pooled std for Cohen's d
-    n1, n2 = len(x_hit), len(x_non)
-    pooled = (((n1 - 1) * (s_hit ** 2) + (n2 - 1) * (s_non ** 2)) / (n1 + n2 - 2)) ** 0.5
-    d = (m_hit - m_non) / pooled if pooled > 0 else 0.0
-
-    feature_effects.append({
-        "feature": col,
-        "hit_mean": m_hit,
-        "non_hit_mean": m_non,
-        "delta": m_hit - m_non,      # raw difference
-        "cohen_d": d                  # standardized difference
-    })
-
-# sort by strongest standardized difference
-feature_effects.sort(key=lambda r: abs(r["cohen_d"]), reverse=True)
-
-# ---------- ADDITION: Explicit Popularity Analysis ----------
-explicit_pop = df.groupby("explicit")["popularity"].mean()
-
-# Calculate hit rates for explicit vs non-explicit
-explicit_tracks = df[df["explicit"] == True]
-non_explicit_tracks = df[df["explicit"] == False]
-explicit_hit_rate = (explicit_tracks["popularity"] >= hit_threshold).mean()
-non_explicit_hit_rate = (non_explicit_tracks["popularity"] >= hit_threshold).mean()
-
-explicit_analysis = {
-    "explicit_mean_pop": float(explicit_pop.get(True, 0.0)),
-    "non_explicit_mean_pop": float(explicit_pop.get(False, 0.0)),
-    "delta": float(explicit_pop.get(True, 0.0) - explicit_pop.get(False, 0.0)),
-    "explicit_hit_rate": float(explicit_hit_rate),
-    "non_explicit_hit_rate": float(non_explicit_hit_rate),
-    "explicit_count": int(len(explicit_tracks)),
-    "non_explicit_count": int(len(non_explicit_tracks))
-}
 
-# ---------- ADDITION: Duration-Popularity Correlation ----------
-corr_duration_pop = float(df["duration_min"].corr(df["popularity"]))
+def group_means(codes, values, n_groups):
+    """Mean per group code, skipping NaN (like groupby().mean()); NaN for empty groups."""
+    ok = ~np.isnan(values)
+    sums = np.bincount(codes[ok], weights=values[ok], minlength=n_groups)
+    counts = np.bincount(codes[ok], minlength=n_groups)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return sums / counts
+
+
+def section_popularity_spectrum(cols, params):
+    """Popularity histogram (5-point bins), key percentiles and the hit threshold."""
+    pop = np.asarray(cols["popularity"])
+    idx = cut_codes(pop, POP_HIST_EDGES)
+    hist = np.bincount(idx[idx >= 0], minlength=len(POP_HIST_LABELS))
+    return {
+        "hist_5pt": [{"bin": label, "count": int(c)} for label, c in zip(POP_HIST_LABELS, hist)],
+        # Key percentiles (where are the cutoffs for top 10%, 25%, etc.)
+        "quantiles": {str(q): float(np.quantile(pop, q)) for q in [0.1, 0.25, 0.5, 0.75, 0.9]},
+        "hit_threshold_top10": params["hit_threshold"]
+    }
+
 
-# Extract top 8 most impactful features (by effect size)
-top_effects = anatomy[:8]
+def section_feature_anatomy(cols, params):
+    """
+    Feature differences between hits and non-hits.
 
+    - effect_sizes: top 10% vs bottom 10% by popularity (Cohen's d per feature)
+    - feature_effects: hits (top 10%) vs all other tracks
+    - means_by_pop_band: mean of every feature per 10-point popularity band
+    """
+    pop = np.asarray(cols["popularity"])
+    top = pop >= np.quantile(pop, 0.90)
+    bottom = pop <= np.quantile(pop, 0.10)
+    is_hit = np.asarray(cols["is_hit"])
+
+    anatomy = []
+    for f in params["anatomy_features"]:
+        v = np.asarray(cols[f])
+        a = v[top][~np.isnan(v[top])]
+        b = v[bottom][~np.isnan(v[bottom])]
+        anatomy.append({
+            "feature": f,
+            "mean_top10": float(np.mean(a)) if len(a) else None,    # Average value for hits
+            "mean_bottom10": float(np.mean(b)) if len(b) else None,  # Average value for non-hits
+            "delta": float(np.mean(a) - np.mean(b)) if len(a) and len(b) else None,  # Raw difference
+            "cohen_d": cohen_d(a, b)  # Standardized difference (effect size)
+        })
+    # Sort by strongest effect (largest |cohen_d|)
+    anatomy = sorted(anatomy, key=lambda x: abs(x["cohen_d"]), reverse=True)
+
+    # Mean features for each popularity band (to show trends)
+    band = cut_codes(pop, POP_BAND_EDGES)
+    in_band = band >= 0
+    band_counts = np.bincount(band[in_band], minlength=len(POP_BAND_LABELS))
+    band_means = {
+        f: group_means(band[in_band], np.asarray(cols[f])[in_band], len(POP_BAND_LABELS))
+        for f in params["anatomy_features"]
+    }
+    feature_by_band = [
+        {"pop_band": label, **{f: float(band_means[f][i]) for f in params["anatomy_features"]}}
+        for i, label in enumerate(POP_BAND_LABELS) if band_counts[i] > 0
+    ]
+
+    # Hits vs everything else
+    feature_effects = []
+    for col in params["effect_features"]:
+        v = np.asarray(cols[col])
+        x_hit = v[is_hit][~np.isnan(v[is_hit])]
+        x_non = v[~is_hit][~np.isnan(v[~is_hit])]
+        if len(x_hit) < 30 or len(x_non) < 30:
+            continue
+
+        m_hit = float(x_hit.mean())
+        m_non = float(x_non.mean())
+        s_hit = float(x_hit.std(ddof=1))
+        s_non = float(x_non.std(ddof=1))
+
+        # pooled std for Cohen's d
+        n1, n2 = len(x_hit), len(x_non)
+        pooled = (((n1 - 1) * (s_hit ** 2) + (n2 - 1) * (s_non ** 2)) / (n1 + n2 - 2)) ** 0.5
+        d = (m_hit - m_non) / pooled if pooled > 0 else 0.0
+
+        feature_effects.append({
+            "feature": col,
+            "hit_mean": m_hit,
+            "non_hit_mean": m_non,
+            "delta": m_hit - m_non,      # raw difference
+            "cohen_d": d                  # standardized difference
+        })
+    # sort by strongest standardized difference
+    feature_effects.sort(key=lambda r: abs(r["cohen_d"]), reverse=True)
 
-story = {
-    "intro": intro,
-    "popularity_spectrum": {
-        "hist_5pt": pop_hist,
-        "quantiles": quantiles,
-        "hit_threshold_top10": hit_threshold
-    },
-    "feature_anatomy": {
+    return {
         "effect_sizes": anatomy,
         "feature_effects": feature_effects,
-        "means_by_pop_band": feature_by_band,
-        "feature_list": feature_cols,
-    },
-    "genre_fingerprints": {
+        "means_by_pop_band": feature_by_band
+    }
+
+
+def section_genre_fingerprints(cols, params):
+    """
+    Per-genre stats for the most popular genres, plus z-scores of their audio features.
+
+    Works on the exploded (track, genre) pairs: genre_row points into the track
+    columns and genre_code into params["genre_names"] (alphabetical).
+    """
+    rows = np.asarray(cols["genre_row"])
+    codes = np.asarray(cols["genre_code"])
+    names = params["genre_names"]
+    n_groups = len(names)
+
+    count = np.bincount(codes, minlength=n_groups)
+    stats = {
+        "popularity_mean": group_means(codes, np.asarray(cols["popularity"])[rows], n_groups),
+        "hit_share": group_means(codes, np.asarray(cols["is_hit"])[rows].astype(float), n_groups)
+    }
+    if "explicit" in cols:
+        stats["explicit_rate"] = group_means(codes, np.asarray(cols["explicit"])[rows].astype(float), n_groups)
+    fingerprint_features = params["fingerprint_features"]
+    for f in fingerprint_features:
+        stats[f] = group_means(codes, np.asarray(cols[f])[rows], n_groups)
+
+    # Top genres by highest average popularity; the table itself stays alphabetical
+    order = np.argsort(-stats["popularity_mean"], kind="stable")[:TOP_N_GENRES]
+    top_genres = [names[i] for i in order]
+    selected = np.sort(order)
+
+    # Z-score of each feature across the selected genres:
+    # which features are unusually high/low for each genre
+    z_rows = []
+    for feat in fingerprint_features:
+        vals = stats[feat][selected]
+        mu = float(np.mean(vals))
+        sd = float(np.std(vals)) if float(np.std(vals)) != 0 else 1.0
+        for i, v in zip(selected, vals):
+            z_rows.append({"genre": names[i], "feature": feat, "z": float((float(v) - mu) / sd)})
+
+    genre_table = []
+    for i in selected:
+        item = {"genre": names[i], "count": int(count[i])}
+        for c in ["popularity_mean", "explicit_rate", "hit_share"] + fingerprint_features:
+            if c in stats:
+                item[c] = float(stats[c][i])
+        genre_table.append(item)
+
+    return {
         "top_genres": top_genres,
         "genre_table": genre_table,
         "z_scores": z_rows,
         "features": fingerprint_features
-    },
-    "hit_blueprint": {
-        "hit_threshold_top10": hit_threshold,
+    }
+
+
+def section_hit_blueprint(cols, params):
+    """Global vs hit (top 10%) averages for every feature, and their deltas."""
+    is_hit = np.asarray(cols["is_hit"])
+    feats = params["anatomy_features"]
+    global_means = {c: float(np.nanmean(cols[c])) for c in feats}
+    hit_means = {c: float(np.nanmean(np.asarray(cols[c])[is_hit])) for c in feats}
+    return {
+        "hit_threshold_top10": params["hit_threshold"],
         "global_means": global_means,
         "hit_means": hit_means,
-        "deltas": deltas
-    },
-    "hit_threshold": hit_threshold,
-    "feature_effects": feature_effects,
-    "takeaway": {
-        "top_effects": top_effects,
-        "genre_overrepresentation": genre_overrep,
-        "explicit_analysis": explicit_analysis,
-        "duration_pop_correlation": corr_duration_pop
-    },
-    "explicit_analysis": explicit_analysis,
-    "corr_duration_pop": corr_duration_pop
+        "deltas": {c: float(hit_means[c] - global_means[c]) for c in feats}
+    }
+
+
+def section_explicit_analysis(cols, params):
+    """Mean popularity and hit rate of explicit vs clean tracks."""
+    pop = np.asarray(cols["popularity"])
+    explicit = np.asarray(cols["explicit"])
+    is_hit = pop >= params["hit_threshold"]
+
+    def mean_or(values, default):
+        return float(np.mean(values)) if len(values) else default
+
+    explicit_mean = mean_or(pop[explicit], 0.0)
+    clean_mean = mean_or(pop[~explicit], 0.0)
+    return {
+        "explicit_mean_pop": explicit_mean,
+        "non_explicit_mean_pop": clean_mean,
+        "delta": explicit_mean - clean_mean,
+        "explicit_hit_rate": mean_or(is_hit[explicit], float("nan")),
+        "non_explicit_hit_rate": mean_or(is_hit[~explicit], float("nan")),
+        "explicit_count": int(explicit.sum()),
+        "non_explicit_count": int((~explicit).sum())
+    }
+
+
+def section_genre_overrepresentation(cols, params):
+    """Genres that punch above their weight: share of hits / share of all tracks (top 10)."""
+    rows = np.asarray(cols["genre_row"])
+    codes = np.asarray(cols["genre_code"])
+    names = params["genre_names"]
+    hit_rows = np.asarray(cols["is_hit"])[rows]
+
+    all_counts = np.bincount(codes, minlength=len(names))
+    hit_counts = np.bincount(codes[hit_rows], minlength=len(names))
+    overall_share = all_counts / max(all_counts.sum(), 1)
+    hit_share = hit_counts / max(hit_counts.sum(), 1)
+
+    has_hits = np.flatnonzero(hit_counts > 0)
+    ratio = hit_share[has_hits] / overall_share[has_hits]
+    order = has_hits[np.argsort(-ratio, kind="stable")][:10]
+    return [
+        {
+            "genre": names[i],
+            "ratio": float(hit_share[i] / overall_share[i]),   # How many times overrepresented (e.g., 1.5 = 50% more hits)
+            "hit_share": float(hit_share[i]),                   # % of hits from this genre
+            "overall_share": float(overall_share[i])            # % of all tracks from this genre
+        }
+        for i in order
+    ]
+
+
+# Merge order of the results (and the order serial runs use)
+SECTIONS = {
+    "popularity_spectrum": section_popularity_spectrum,
+    "feature_anatomy": section_feature_anatomy,
+    "genre_fingerprints": section_genre_fingerprints,
+    "hit_blueprint": section_hit_blueprint,
+    "explicit_analysis": section_explicit_analysis,
+    "genre_overrepresentation": section_genre_overrepresentation,
 }
 
-OUT.write_text(json.dumps(story, indent=2), encoding="utf-8")
-print(f"Wrote {OUT} with {n_tracks} rows used.")
+
+def share_columns(columns, directory):
+    """Write each column as a .npy file so workers can memory-map it instead of receiving a pickled copy."""
+    for name, values in columns.items():
+        np.save(Path(directory) / f"{name}.npy", np.ascontiguousarray(values))
+
+
+def load_shared_columns(directory):
+    """Memory-map the columns written by share_columns (read-only, no copy)."""
+    return {p.stem: np.load(p, mmap_mode="r") for p in Path(directory).glob("*.npy")}
+
+
+def _run_shared_section(name, directory, params):
+    """Worker entry point: map the shared columns and run one section."""
+    load_heavy_modules()
+    return SECTIONS[name](load_shared_columns(directory), params)
+
+
+def traced_peak(fn, *args):
+    """
+    Run fn(*args) under tracemalloc.
+
+    Returns:
+        tuple: (result, peak bytes allocated above what was allocated at the start)
+    """
+    import tracemalloc
+
+    tracemalloc.start()
+    try:
+        base = tracemalloc.get_traced_memory()[0]
+        result = fn(*args)
+        return result, tracemalloc.get_traced_memory()[1] - base
+    finally:
+        tracemalloc.stop()
+
+
+def _run_shared_section_traced(name, directory, params):
+    """Worker entry point for --benchmark: the section result plus (worker pid, tracemalloc peak)."""
+    result, peak = traced_peak(_run_shared_section, name, directory, params)
+    return result, os.getpid(), peak
+
+
+def run_sections(columns, params, workers=1, trace=False):
+    """
+    Run every analysis section, serially or in a process pool.
+
+    With workers > 1 the columns are written once to a temporary directory and
+    memory-mapped by each worker, so the OS page cache holds a single copy no
+    matter how many workers read it.
+
+    Args:
+        columns: dict of 1D numpy arrays (cleaned track columns + exploded genre codes)
+        params: Settings passed to every section
+        workers: Number of worker processes (1 = run in this process)
+        trace: Also measure memory with tracemalloc (see benchmark_sections)
+
+    Returns:
+        dict: Section name -> result, in SECTIONS order
+        (with trace: a tuple (results, peak bytes above baseline))
+    """
+    def run_serial():
+        return {name: fn(columns, params) for name, fn in SECTIONS.items()}
+
+    if workers <= 1:
+        return traced_peak(run_serial) if trace else run_serial()
+
+    import tempfile
+    from concurrent.futures import ProcessPoolExecutor
+
+    entry = _run_shared_section_traced if trace else _run_shared_section
+    with tempfile.TemporaryDirectory(prefix="prep_columns_") as tmp:
+        share_columns(columns, tmp)
+        with ProcessPoolExecutor(max_workers=min(workers, len(SECTIONS)), initializer=load_heavy_modules) as pool:
+            futures = {name: pool.submit(entry, name, tmp, params) for name in SECTIONS}
+            results = {name: futures[name].result() for name in SECTIONS}
+    if not trace:
+        return results
+
+    # A worker can run several sections one after another: count its largest peak once
+    worker_peaks = {}
+    for name, (result, pid, peak) in results.items():
+        results[name] = result
+        worker_peaks[pid] = max(worker_peaks.get(pid, 0), peak)
+    return results, sum(worker_peaks.values())
+
+
+def benchmark_sections(columns, params, workers):
+    """
+    Time the sections serially and in parallel, check the results match, and print the comparison.
+
+    Memory is the same quantity for both runs: the tracemalloc peak above the
+    baseline (numpy / pandas already imported, columns already in memory) of
+    the serial run, against the sum of every worker's peak above its own
+    baseline. Shared memory-mapped columns are not allocations, so they count
+    in neither. The memory runs are separate from the timed runs, because
+    tracing slows allocation-heavy code down.
+    """
+    import time
+
+    start = time.perf_counter()
+    serial = run_sections(columns, params, workers=1)
+    t_serial = time.perf_counter() - start
+
+    start = time.perf_counter()
+    parallel = run_sections(columns, params, workers=workers)
+    t_parallel = time.perf_counter() - start
+
+    _, serial_peak = run_sections(columns, params, workers=1, trace=True)
+    _, parallel_peak = run_sections(columns, params, workers=workers, trace=True)
+
+    same = json.dumps(serial, sort_keys=True) == json.dumps(parallel, sort_keys=True)
+    shared_mb = sum(np.asarray(v).nbytes for v in columns.values()) / 1e6
+    print(f"Sections serial:   {t_serial:.2f} s")
+    print(f"Sections parallel: {t_parallel:.2f} s on {workers} workers "
+          f"({t_serial / t_parallel:.2f}x speedup), results identical: {same}")
+    print(f"Shared column data: {shared_mb:.1f} MB, memory-mapped by every worker")
+    print(f"Peak memory above baseline (tracemalloc): serial {serial_peak / 1e6:.1f} MB, "
+          f"parallel {parallel_peak / 1e6:.1f} MB summed over workers "
+          f"({(parallel_peak - serial_peak) / 1e6:+.1f} MB)")
+    return parallel
+
+
+def main():
+    """Run the full pipeline: raw CSV -> cleaned tracks -> story.json (+ side files)."""
+    args = parse_args()
+    if not (args.force or args.benchmark) and is_up_to_date(args):
+        print(f"{OUT} is up to date (input CSV, pipeline and options unchanged), nothing to do.")
+        return
+
+    load_heavy_modules()
+
+    # Create output directory if it doesn't exist
+    OUT.parent.mkdir(parents=True, exist_ok=True)
+
+    # ========================
+    # LOAD & CLEAN DATA
+    # ========================
+    # Read the CSV file into a pandas DataFrame
+    df = pd.read_csv(RAW)
+
+    # Select only the columns we need (ignore the rest)
+    needed = list(SCHEMA)
+    cols = [c for c in needed if c in df.columns]
+    df = df[cols].copy()
+
+    # Validate all schema rules at once; failing rows (missing critical values,
+    # unparseable types, out-of-range values) go to the quarantine file
+    rows_in = len(df)
+    valid_mask, rule_counts, reasons = validate_rows(df)
+    quarantine = df[~valid_mask].assign(_reasons=reasons)
+    quarantine.to_csv(QUARANTINE_OUT, index=False)
+    df = df[valid_mask]
+    validation = {
+        "rows_in": int(rows_in),
+        "rows_valid": int(len(df)),
+        "rows_quarantined": int(len(quarantine)),
+        "rule_failures": rule_counts,          # rows failing each rule (a row can fail several)
+        "quarantine_file": QUARANTINE_OUT.as_posix()
+    }
+    print(f"Loaded {len(df):,} tracks ({len(quarantine):,} quarantined -> {QUARANTINE_OUT}).")
+
+    # ========================
+    # IDENTIFY DUPLICATES (same track_name + artists)
+    # ========================
+    # Find rows that have the same track_name AND artists
+    duplicates_mask = df.duplicated(subset=["track_name", "artists"], keep=False)
+    n_duplicates_before = duplicates_mask.sum()
+
+    if n_duplicates_before > 0:
+        print(f"\n🔍 Found {n_duplicates_before} rows that are duplicates (same track_name + artists)")
+
+        # Show which columns differ among duplicates
+        duplicate_rows = df[duplicates_mask].sort_values(["track_name", "artists"])
+
+        print("\nSample duplicate entries:")
+        print("=" * 100)
+
+        # Show first few duplicate sets
+        for track_name in duplicate_rows["track_name"].unique()[:3]:  # Show first 3 duplicates
+            dups = duplicate_rows[duplicate_rows["track_name"] == track_name]
+            print(f"\n📌 Track: '{track_name}'")
+
+            # Find which columns differ
+            different_cols = []
+            for col in df.columns:
+                if len(dups[col].unique()) > 1:  # Column has different values
+                    different_cols.append(col)
+
+            if different_cols:
+                print(f"   Columns that differ: {', '.join(different_cols)}")
+                for col in different_cols:
+                    print(f"      {col}: {list(dups[col].unique())}")
+            else:
+                print(f"   All columns are identical (exact duplicate)")
+
+        print("\n" + "=" * 100)
+
+    # ========================
+    # MERGE DUPLICATES WITH RULES
+    # ========================
+    # Audio features to average
+    audio_features_to_avg = [
+        "popularity", "danceability", "energy", "valence", "tempo",
+        "acousticness", "instrumentalness", "liveness", "speechiness", "loudness"
+    ]
+
+    # Fields that if different, mean we should keep rows separate
+    # Note: do NOT keep separate when `track_id` differs — we'll take the first `track_id` instead
+    keep_separate_if_different = ["duration_ms", "explicit"]
+
+    print("🔄 Merging duplicates ...")
+
+    # Check for rows that should be kept separate (different track_id, duration, or explicit)
+    df["_should_keep_separate"] = False
+
+    for idx, group_df in df.groupby(["track_name", "artists"]):
+        if len(group_df) > 1:  # Only check groups with duplicates
+            for col in keep_separate_if_different:
+                if col in group_df.columns and len(group_df[col].unique()) > 1:
+                    # Mark these rows to keep separate
+                    df.loc[group_df.index, "_should_keep_separate"] = True
+                    break
+
+    # Split into two: mergeable and non-mergeable
+    mergeable_df = df[~df["_should_keep_separate"]].copy()
+    keep_separate_df = df[df["_should_keep_separate"]].copy()
+
+    # Merge the mergeable ones using agg
+    if len(mergeable_df) > 0:
+        # Create aggregation dict
+        agg_dict = {}
+
+        # Average these features
+        for feat in audio_features_to_avg:
+            if feat in mergeable_df.columns:
+                agg_dict[feat] = "mean"
+
+        # Concatenate genres
+        if "track_genre" in mergeable_df.columns:
+            agg_dict["track_genre"] = lambda x: ";".join(sorted(set(";".join(x.astype(str)).split(";"))))
+
+        # Concatenate albums
+        if "album_name" in mergeable_df.columns:
+            agg_dict["album_name"] = lambda x: ";".join(sorted(set(x.dropna().astype(str))))
+
+        # Keep first value for other columns
+        for col in mergeable_df.columns:
+            if col not in agg_dict and col != "_should_keep_separate":
+                agg_dict[col] = "first"
+
+        # Group and aggregate
+        merged = mergeable_df.groupby(["track_name", "artists"], as_index=False).agg(agg_dict)
+
+        # Combine: merged + kept_separate
+        # Only drop the helper column if it exists (avoid KeyError)
+        if "_should_keep_separate" in keep_separate_df.columns:
+            keep_separate_df = keep_separate_df.drop(columns=["_should_keep_separate"])
+        if "_should_keep_separate" in merged.columns:
+            merged = merged.drop(columns=["_should_keep_separate"])
+        df = pd.concat([merged, keep_separate_df], ignore_index=True)
+    else:
+        # Drop helper column only if present
+        if "_should_keep_separate" in keep_separate_df.columns:
+            df = keep_separate_df.drop(columns=["_should_keep_separate"])
+        else:
+            df = keep_separate_df
+
+    if n_duplicates_before > 0:
+        print(f"\n✓ Processed {n_duplicates_before} duplicate rows")
+        print(f"  Final track count: {len(df):,}")
+        print(f"  Rules applied:")
+        print(f"    - track_genre: concatenated with ';'")
+        print(f"    - album_name: concatenated with ';'")
+        print(f"    - Audio features: averaged")
+        print(f"    - If duration_ms/explicit differ: kept separate")
+        print(f"    - If track_id differs: first track_id is used")
+
+    # Convert duration from milliseconds to minutes (easier to work with)
+    df["duration_min"] = df["duration_ms"] / 60000.0
+
+    # Extract unique artist count (split by ";" for multi-artist tracks)
+    artist_sets = df["artists"].astype(str).str.split(";")
+    unique_artists = len(set(a.strip() for sub in artist_sets for a in sub if a.strip()))
+
+    # Explode multi-genre entries early so genre-level analyses can use it
+    # (the exploded index then maps every (track, genre) pair back to its track row)
+    df = df.reset_index(drop=True)
+    df_genres = df.copy()
+    if "track_genre" in df_genres.columns:
+        df_genres["track_genre"] = df_genres["track_genre"].astype(str).str.split(";")
+        df_genres = df_genres.explode("track_genre")
+        df_genres["track_genre"] = df_genres["track_genre"].astype(str).str.strip()
+    else:
+        df_genres = df_genres.assign(track_genre="")
+
+    # Basic dataset stats
+    n_tracks = int(len(df))
+    # Number of unique genres (from exploded rows so multi-genre tracks count per genre)
+    n_genres = int(df_genres["track_genre"].nunique())
+
+    # Explicit track rate (% of tracks marked as explicit)
+    explicit_rate = float(np.mean(df["explicit"].astype(int))) if "explicit" in df.columns else None
+
+
+    # ========================
+    # SECTION 1: INTRO STATS
+    # ========================
+    # Select 3 representative tracks for the cold open:
+    # 1. Top hit (popularity ~100)
+    # 2. Median track (popularity ~34)
+    # 3. Long tail track (popularity < 10)
+    feature_cols_for_examples = [
+        "track_id", "track_name", "artists", "track_genre", "popularity",
+        "danceability", "energy", "loudness", "instrumentalness",
+        "acousticness", "duration_min", "valence", "speechiness",
+        "liveness", "tempo"
+    ]
+    available_cols = [col for col in feature_cols_for_examples if col in df.columns]
+
+    # Get median popularity value
+    median_pop = df["popularity"].median()
+
+    # Build the "not really music" mask once (sleep/ASMR/ambient/white noise)
+    # and reuse it for every example pick below
+    non_music = df["track_genre"].str.contains("sleep|asmr|ambient|white-noise", case=False, na=False).to_numpy()
+    popularity = df["popularity"].to_numpy(dtype=float)
+
+    # Top 10 hits for the dot plot visualization (partial selection, no full sort);
+    # the first one doubles as the cold-open top hit
+    top_10_hits = df.nlargest(10, "popularity")[available_cols].to_dict(orient="records")
+    top_hit = dict(top_10_hits[0])
+
+    # For median: exclude ASMR/sleep/ambient genres to get a real music track
+    median_pool = np.flatnonzero(~non_music) if (~non_music).any() else np.arange(len(df))
+    median_pos = median_pool[np.argmin(np.abs(popularity[median_pool] - median_pop))]
+    median_track = df.iloc[[median_pos]][available_cols].to_dict(orient="records")[0]
+
+    # For long tail: pick a low-popularity track (excluding sleep/ASMR)
+    long_tail_candidates = df[(popularity < 10) & ~non_music]
+    long_tail = long_tail_candidates.sample(n=1, random_state=42)[available_cols].to_dict(orient="records")[0] if len(long_tail_candidates) > 0 else df.nsmallest(1, "popularity")[available_cols].to_dict(orient="records")[0]
+
+    examples = [top_hit, median_track, long_tail] + top_10_hits
+
+    # Compile intro section: overview statistics
+    intro = {
+        "tracks": n_tracks,                                    # Total tracks analyzed
+        "unique_artists": unique_artists,                      # How many different artists
+        "unique_genres": n_genres,                             # How many different genres
+        "explicit_rate": explicit_rate,                        # % of tracks that are explicit
+        "median_popularity": float(df["popularity"].median()), # Middle popularity score
+        "median_duration_min": float(df["duration_min"].median()), # Middle song length
+        "median_tempo": float(df["tempo"].median()) if "tempo" in df.columns else None,
+        "example_hits": examples                               # Top 10 tracks by popularity
+    }
+
+
+    # ========================
+    # SECTIONS 2-6: POPULARITY SPECTRUM, FEATURE ANATOMY, GENRE FINGERPRINTS,
+    # HIT BLUEPRINT, EXPLICIT ANALYSIS, GENRE OVERREPRESENTATION
+    # ========================
+    # Define "hit" = top 10% by popularity (shared by every section)
+    hit_threshold = float(df["popularity"].quantile(0.90))
+    df["is_hit"] = df["popularity"] >= hit_threshold
+    # 10-point popularity bands (also used by the exemplars below)
+    df["pop_band_10"] = pd.cut(df["popularity"], bins=POP_BAND_EDGES, labels=POP_BAND_LABELS)
+
+    # These are the audio features Spotify measures for each track
+    anatomy_features = [c for c in [
+        "danceability", "energy", "valence", "tempo",
+        "acousticness", "instrumentalness", "liveness", "speechiness",
+        "loudness", "duration_min"
+    ] if c in df.columns]
+    # Choose the features you want to compare (match your site’s visuals)
+    feature_cols = [c for c in [
+        "danceability", "energy", "valence", "acousticness",
+        "instrumentalness", "liveness", "speechiness",
+        "tempo", "loudness", "duration_min"
+    ] if c in df.columns]
+    fingerprint_features = [c for c in [
+        "danceability", "energy", "valence", "acousticness", "instrumentalness",
+        "speechiness", "tempo", "loudness", "duration_min"
+    ] if c in df.columns]
+
+    # Sections only see plain arrays: cleaned track columns plus the exploded
+    # (track, genre) pairs as integer codes (genre names sorted alphabetically)
+    genre_code, genre_names = pd.factorize(df_genres["track_genre"], sort=True)
+    section_columns = {
+        "popularity": df["popularity"].to_numpy(dtype=np.float64),
+        "is_hit": df["is_hit"].to_numpy(dtype=bool),
+        "explicit": df["explicit"].to_numpy(dtype=bool),
+        "genre_row": df_genres.index.to_numpy(dtype=np.int64),
+        "genre_code": genre_code.astype(np.int32),
+        **{c: df[c].to_numpy(dtype=np.float64) for c in dict.fromkeys(anatomy_features + feature_cols + fingerprint_features)}
+    }
+    section_params = {
+        "hit_threshold": hit_threshold,
+        "anatomy_features": anatomy_features,
+        "effect_features": feature_cols,
+        "fingerprint_features": fingerprint_features,
+        "genre_names": [str(g) for g in genre_names]
+    }
+
+    # Serial unless --workers asks for a pool: no speedup has been measured yet
+    # that would justify a default row threshold (--benchmark reports it)
+    if args.benchmark:
+        sections = benchmark_sections(section_columns, section_params, max(args.workers or os.cpu_count() or 1, 2))
+    else:
+        sections = run_sections(section_columns, section_params, args.workers or 1)
+
+    pop_hist = sections["popularity_spectrum"]["hist_5pt"]
+    quantiles = sections["popularity_spectrum"]["quantiles"]
+    anatomy = sections["feature_anatomy"]["effect_sizes"]
+    feature_effects = sections["feature_anatomy"]["feature_effects"]
+    feature_by_band = sections["feature_anatomy"]["means_by_pop_band"]
+    top_genres = sections["genre_fingerprints"]["top_genres"]
+    genre_table = sections["genre_fingerprints"]["genre_table"]
+    z_rows = sections["genre_fingerprints"]["z_scores"]
+    global_means = sections["hit_blueprint"]["global_means"]
+    hit_means = sections["hit_blueprint"]["hit_means"]
+    deltas = sections["hit_blueprint"]["deltas"]
+    explicit_analysis = sections["explicit_analysis"]
+    genre_overrep = sections["genre_overrepresentation"]
+
+    # ---------- ADDITION: Bootstrap confidence intervals ----------
+    # Every d (top 10% vs bottom 10%, hits vs non-hits) and every genre
+    # overrepresentation ratio gets a percentile CI, so an ordering that
+    # could flip between snapshots is visible next to the estimate.
+    def attach_d_ci(effects, group_a, group_b, seed):
+        feats = [e["feature"] for e in effects]
+        if not feats:
+            return
+        a = group_a[feats].to_numpy(dtype=np.float64)
+        b = group_b[feats].to_numpy(dtype=np.float64)
+        reps = bootstrap(bootstrap_cohen_d, (a, b), rep_bytes=16 * max(len(a), len(b)),
+                         n_reps=args.bootstrap_reps, seed=seed, workers=args.workers)
+        lo, hi = percentile_ci(reps)
+        for e, l, h in zip(effects, lo, hi):
+            e["cohen_d_ci"] = [float(l), float(h)]
+
+    top = df[df["popularity"] >= df["popularity"].quantile(0.90)]
+    bottom = df[df["popularity"] <= df["popularity"].quantile(0.10)]
+    attach_d_ci(anatomy, top, bottom, seed=42)
+    attach_d_ci(feature_effects, df[df["is_hit"]], df[~df["is_hit"]], seed=43)
+
+    ratio_reps = bootstrap(
+        bootstrap_genre_ratio,
+        (section_columns["genre_code"], section_columns["genre_row"], section_columns["is_hit"], len(genre_names)),
+        rep_bytes=16 * n_tracks + 24 * len(genre_code),
+        n_reps=args.bootstrap_reps,
+        seed=44,
+        workers=args.workers
+    )
+    ratio_lo, ratio_hi = percentile_ci(ratio_reps)
+    genre_pos = {g: i for i, g in enumerate(section_params["genre_names"])}
+    for item in genre_overrep:
+        i = genre_pos[item["genre"]]
+        item["ratio_ci"] = [float(ratio_lo[i]), float(ratio_hi[i])]
+
+    bootstrap_meta = {
+        "replicates": args.bootstrap_reps,
+        "ci_level": BOOTSTRAP_CI,
+        "method": "poisson-weighted percentile bootstrap"
+    }
+
+    # ---------- ADDITION: Duration-Popularity Correlation ----------
+    corr_duration_pop = float(df["duration_min"].corr(df["popularity"]))
+
+    # ---------- ADDITION: Full correlation matrices ----------
+    # Two chunked passes over the frame give both matrices, covering every
+    # feature x feature pair (popularity included); stored row-major + shape
+    corr_features = ["popularity"] + [c for c in feature_cols if c in df.columns]
+    pearson, spearman, corr_n = correlation_matrices(df, corr_features)
+
+    correlations = {
+        "features": corr_features,
+        "n": corr_n,
+        "dtype": "float32",
+        "pearson": float32_flat(pearson),
+        "spearman": float32_flat(spearman)
+    }
+
+    # Extract top 8 most impactful features (by effect size)
+    top_effects = anatomy[:8]
+
+
+    # ---------- ADDITION: Representative tracks per band / genre ----------
+    # Medoid-like + top-k exemplars for every popularity band (real music only)
+    # and for every genre (exploded rows, so multi-genre tracks count per genre)
+    exemplar_features = [c for c in feature_cols if c in df.columns]
+    exemplars = {
+        "features": exemplar_features,
+        "by_pop_band": group_exemplars(df[~non_music], "pop_band_10", exemplar_features, available_cols, k=EXEMPLARS_TOP_K),
+        "by_genre": group_exemplars(df_genres, "track_genre", exemplar_features, available_cols, k=EXEMPLARS_TOP_K)
+    }
+
+    # ---------- ADDITION: Hit probability model ----------
+    # Regularized logistic regression: is_hit ~ audio features.
+    # Features are standardized with training-split statistics, then the model is
+    # fitted from mini-batches and scored in large vectorized batches. Every batch
+    # is read from a block of df, so only one batch of features is held as floats.
+    model_features = [c for c in feature_cols if c in df.columns]
+    model_pos = df.columns.get_indexer(model_features)
+    is_hit_col = df["is_hit"].to_numpy(dtype=bool)
+
+
+    def feature_block(rows):
+        """Float64 feature values for a block of rows (slice or positions), read straight from df."""
+        return df.iloc[rows, model_pos].to_numpy(dtype=np.float64, na_value=np.nan)
+
+
+    # Three disjoint splits: train (gradient updates), validation (early
+    # stopping) and holdout (the metrics reported in story.json)
+    rng = np.random.default_rng(42)
+    split = rng.random(len(df))
+    holdout_mask = split < MODEL_HOLDOUT_SHARE
+    validation_mask = ~holdout_mask & (split < MODEL_HOLDOUT_SHARE + MODEL_VALIDATION_SHARE)
+    train_mask = ~holdout_mask & ~validation_mask
+    train_idx = np.flatnonzero(train_mask)
+    validation_idx = np.flatnonzero(validation_mask)
+    holdout_idx = np.flatnonzero(holdout_mask)
+
+    # Training-split mean / std per feature, accumulated over blocks of df in
+    # two passes (sum, then squared deviations), so no full feature matrix is built
+    train_n = np.zeros(len(model_features))
+    train_sum = np.zeros(len(model_features))
+    for start, stop in iter_blocks(len(df), SCORE_BATCH_ROWS):
+        X = feature_block(slice(start, stop))[train_mask[start:stop]]
+        train_n += (~np.isnan(X)).sum(axis=0)
+        train_sum += np.nansum(X, axis=0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        model_mu = train_sum / train_n
+    train_sq = np.zeros(len(model_features))
+    for start, stop in iter_blocks(len(df), SCORE_BATCH_ROWS):
+        X = feature_block(slice(start, stop))[train_mask[start:stop]]
+        train_sq += np.nansum((X - model_mu) ** 2, axis=0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        model_sd = np.sqrt(train_sq / train_n)
+    model_sd[~(model_sd > 0)] = 1.0
+
+
+    def standardized_rows(rows):
+        """Standardize a block of rows (missing values -> training mean, i.e. 0)."""
+        return np.nan_to_num((feature_block(rows) - model_mu) / model_sd)
+
+
+    def model_batches(index, batch_rows, shuffle=False):
+        """Return a callable yielding (X, y) batches over the given row index."""
+        def batches():
+            for start, stop in iter_blocks(len(index), batch_rows, rng if shuffle else None):
+                rows = index[start:stop]
+                yield standardized_rows(rows), is_hit_col[rows].astype(np.float64)
+        return batches
+
+
+    hit_model_fit = train_logistic(
+        model_batches(train_idx, MODEL_BATCH_ROWS, shuffle=True),
+        model_batches(validation_idx, SCORE_BATCH_ROWS),
+        n_features=len(model_features),
+        l2=MODEL_L2
+    )
+    w, b = hit_model_fit["weights"], hit_model_fit["intercept"]
+
+    # Score every track in vectorized batches (never row by row)
+    hit_proba = np.empty(len(df), dtype=np.float32)
+    for start, stop in iter_blocks(len(df), SCORE_BATCH_ROWS):
+        hit_proba[start:stop] = sigmoid(standardized_rows(slice(start, stop)) @ w + b)
+
+    holdout_proba = hit_proba[holdout_idx].astype(np.float64)
+    holdout_y = is_hit_col[holdout_idx].astype(np.float64)
+    clipped = np.clip(holdout_proba, 1e-12, 1 - 1e-12)
+    holdout_log_loss = -float(np.mean(holdout_y * np.log(clipped) + (1 - holdout_y) * np.log(1 - clipped))) if len(holdout_y) else None
+    scores_path = write_columnar(
+        pd.DataFrame({
+            "track_id": df["track_id"].to_numpy(),
+            "hit_probability": hit_proba,
+            "is_hit": is_hit_col,
+            "holdout": holdout_mask
+        }),
+        SCORES_OUT
+    )
+
+    hit_model = {
+        "features": model_features,
+        "coefficients": {f: float(c) for f, c in zip(model_features, w)},  # Per 1 std dev of the feature
+        "intercept": float(b),
+        "l2": MODEL_L2,
+        "epochs": hit_model_fit["epochs"],
+        "n_train": int(len(train_idx)),
+        "n_validation": int(len(validation_idx)),
+        "n_holdout": int(len(holdout_idx)),
+        "validation_log_loss": float(hit_model_fit["val_log_loss"]),
+        "holdout_log_loss": holdout_log_loss,
+        "holdout_auc": roc_auc(holdout_y, holdout_proba),
+        "calibration": calibration_bins(holdout_y, holdout_proba),
+        "scores_file": scores_path.as_posix()
+    }
+    # AUC is None when the holdout has only one class (e.g. no hits in a tiny catalog)
+    auc_text = f"{hit_model['holdout_auc']:.3f}" if hit_model["holdout_auc"] is not None else "n/a"
+    print(f"Hit model: holdout AUC {auc_text} after {hit_model['epochs']} epochs -> {scores_path}")
+
+
+    # ---------- ADDITION: Pre-binned chart data ----------
+    # Everything here is aggregated into fixed-size arrays so the browser never
+    # needs per-track rows: popularity x feature count grids (3 resolutions),
+    # hit vs non-hit histogram + KDE curves, and an LTTB-downsampled rank curve.
+    pop_lo, pop_hi = FEATURE_DOMAINS["popularity"]
+    pop_values = df["popularity"].to_numpy(dtype=float)
+    is_hit_arr = df["is_hit"].to_numpy(dtype=bool)
+    fine = CHART_GRID_LEVELS[0]
+
+    chart_grids = {}
+    chart_curves = {}
+    for f in [c for c in feature_cols if c in df.columns]:
+        values = df[f].to_numpy(dtype=float)
+        ok = ~np.isnan(values)
+        lo, hi = feature_domain(values[ok], f)
+
+        # One bincount over combined (popularity bin, feature bin) codes -> finest grid,
+        # coarser levels are block sums of it
+        pop_idx = bin_index(pop_values[ok], pop_lo, pop_hi, fine)
+        feat_idx = bin_index(values[ok], lo, hi, fine)
+        grid = np.bincount(pop_idx * fine + feat_idx, minlength=fine * fine).reshape(fine, fine)
+        chart_grids[f] = {
+            "domain": [lo, hi],
+            "levels": {str(n): coarsen_grid(grid, n).tolist() for n in CHART_GRID_LEVELS}
+        }
+
+        # Hit vs non-hit distribution curves (density histogram + binned KDE)
+        curve_idx = bin_index(values[ok], lo, hi, CHART_CURVE_BINS)
+        bin_width = (hi - lo) / CHART_CURVE_BINS
+        curves = {}
+        for name, mask in [("hit", is_hit_arr[ok]), ("non_hit", ~is_hit_arr[ok])]:
+            counts = np.bincount(curve_idx[mask], minlength=CHART_CURVE_BINS).astype(float)
+            n_group = int(mask.sum())
+            curves[name] = {
+                "n": n_group,
+                "hist": float32_rows([counts / (n_group * bin_width) if n_group else counts])[0],
+                "kde": float32_rows([binned_kde(counts, bin_width, n_group, float(np.std(values[ok][mask])) if n_group else 0.0)])[0]
+            }
+        chart_curves[f] = {"domain": [lo, hi], "bins": CHART_CURVE_BINS, **curves}
+
+    # Popularity rank curve (the "long tail"): tracks sorted by popularity,
+    # downsampled so its shape survives at a fixed number of points
+    rank_y = np.sort(pop_values)[::-1]
+    rank_x = np.arange(len(rank_y)) / max(len(rank_y) - 1, 1)
+    rank_x, rank_y = lttb(rank_x, rank_y, CHART_SERIES_POINTS)
+
+    chart_data = {
+        "n_tracks": n_tracks,
+        "popularity_domain": [pop_lo, pop_hi],
+        "grid_levels": list(CHART_GRID_LEVELS),
+        "grids": chart_grids,            # rows = popularity bins, columns = feature bins
+        "curves": chart_curves,
+        "series": {
+            "popularity_rank": {
+                "x": float32_rows([rank_x])[0],   # share of tracks ranked above (0 = most popular)
+                "y": float32_rows([rank_y])[0]
+            }
+        }
+    }
+    CHARTS_OUT.write_text(json.dumps(chart_data, separators=(",", ":")), encoding="utf-8")
+    print(f"Wrote {CHARTS_OUT} ({CHARTS_OUT.stat().st_size / 1024:.0f} KB)")
+
+    story = {
+        "intro": intro,
+        "popularity_spectrum": {
+            "hist_5pt": pop_hist,
+            "quantiles": quantiles,
+            "hit_threshold_top10": hit_threshold
+        },
+        "feature_anatomy": {
+            "effect_sizes": anatomy,
+            "feature_effects": feature_effects,
+            "means_by_pop_band": feature_by_band,
+            "feature_list": feature_cols,
+        },
+        "genre_fingerprints": {
+            "top_genres": top_genres,
+            "genre_table": genre_table,
+            "z_scores": z_rows,
+            "features": fingerprint_features
+        },
+        "hit_blueprint": {
+            "hit_threshold_top10": hit_threshold,
+            "global_means": global_means,
+            "hit_means": hit_means,
+            "deltas": deltas
+        },
+        "hit_threshold": hit_threshold,
+        "feature_effects": feature_effects,
+        "takeaway": {
+            "top_effects": top_effects,
+            "genre_overrepresentation": genre_overrep,
+            "explicit_analysis": explicit_analysis,
+            "duration_pop_correlation": corr_duration_pop
+        },
+        "explicit_analysis": explicit_analysis,
+        "corr_duration_pop": corr_duration_pop,
+        "correlations": correlations,
+        "hit_model": hit_model,
+        "exemplars": exemplars,
+        "chart_data_file": CHARTS_OUT.as_posix(),
+        "bootstrap": bootstrap_meta,
+        "metadata": {
+            "validation": validation
+        }
+    }
+
+    OUT.write_text(dumps_indented(story), encoding="utf-8")
+    print(f"Wrote {OUT} with {n_tracks} rows used.")
+
+    write_stamp(args, [OUT, CHARTS_OUT, QUARANTINE_OUT, scores_path])
+
+
+if __name__ == "__main__":
+    main()